@@ -6,3 +6,7 @@ User = get_user_model()
 def authenticate_user(*, username: str, password: str) -> User:
     user = User.objects.filter(username=username).first()
     return user if user and user.check_password(password) else None
+
+
+def get_existing_user_ids(*, user_ids: set[int]) -> set[int]:
+    return set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
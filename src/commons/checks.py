@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+@register()
+def check_bulk_rate_throttles(app_configs, **kwargs):
+    """A bulk submission of BULK_RATES_MAX_ITEMS rates must fit in the burst of a shard of every bulk throttle"""
+    from commons.throttles import BulkPostRateThrottle, BulkUserHourlyPostRateThrottle
+
+    return [
+        Error(
+            f'BULK_RATES_MAX_ITEMS ({settings.BULK_RATES_MAX_ITEMS}) is above the {max_cost} rates {throttle.__name__} '
+            f'admits at once, the largest bulk submissions would always be rejected.',
+            hint='Lower BULK_RATES_MAX_ITEMS, or raise the burst of the throttle (POST_RATE_LIMIT_BURST, '
+                 'FRAUD_DETECTION_MAX_RATES_PER_HOUR) or lower POST_RATE_LIMIT_SHARDS.',
+            obj=throttle,
+            id='commons.E001',
+        )
+        for throttle in (BulkPostRateThrottle, BulkUserHourlyPostRateThrottle)
+        if settings.BULK_RATES_MAX_ITEMS > (max_cost := throttle.get_max_cost())
+    ]
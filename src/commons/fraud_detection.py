@@ -1,11 +1,36 @@
+import random
 import time
 
-import redis
 from django.conf import settings
 
+from core.settings.third_parties.cache import get_async_redis_client, get_redis_client
 from core.settings.third_parties.redis_templates import RedisKeyTemplates
 
-redis_client = redis.StrictRedis.from_url(settings.REDIS_LOCATION)
+redis_client = get_redis_client()
+async_redis_client = get_async_redis_client()
+
+"""
+Sliding window over a sorted set of action timestamps, checked and recorded in one server-side step.
+KEYS[1]: window key, ARGV: now, window (seconds), suspicious threshold, actions to track, member
+returns 1 when the action is suspicious (it is not recorded then), 0 otherwise
+"""
+SLIDING_WINDOW_SCRIPT = """
+local now, window = tonumber(ARGV[1]), tonumber(ARGV[2])
+local threshold, tracked = tonumber(ARGV[3]), tonumber(ARGV[4])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local recent_actions = redis.call('ZCARD', KEYS[1])
+if recent_actions >= threshold then
+    return 1
+end
+
+redis.call('ZADD', KEYS[1], now, ARGV[5])
+if recent_actions >= tracked then
+    redis.call('ZREMRANGEBYRANK', KEYS[1], 0, recent_actions - tracked)
+end
+redis.call('EXPIRE', KEYS[1], math.ceil(window))
+return 0
+"""
 
 
 class FraudDetection:
@@ -13,25 +38,41 @@ class FraudDetection:
     suspicious_threshold = settings.SUSPICIOUS_THRESHOLD
     time_threshold = settings.TIME_THRESHOLD
     last_actions_to_track = settings.LAST_ACTIONS_TO_TRACK
+    sliding_window = redis_client.register_script(SLIDING_WINDOW_SCRIPT)
+    async_sliding_window = async_redis_client.register_script(SLIDING_WINDOW_SCRIPT)
+
+    @classmethod
+    def get_script_args(cls, now: float) -> list:
+        """members must be unique, two actions can share the same timestamp"""
+        member = f"{now:.6f}:{random.getrandbits(32):08x}"
+        return [now, cls.time_threshold, cls.suspicious_threshold, cls.last_actions_to_track, member]
 
     @classmethod
     def detect_suspicious_activity(cls, post_id: int) -> bool:
         """
         Checks for suspicious activity based on the number of rating actions within a certain time frame.
+        The check and the record of the action are one atomic script call, one round-trip to redis.
         """
         fraud_detect_key = RedisKeyTemplates.format_fraud_detect_key(post_id)
-        recent_actions = redis_client.lrange(fraud_detect_key, 0, -1)
-
-        if len(recent_actions) >= cls.suspicious_threshold:
-            first_action_time = float(recent_actions[0])
-            current_time = time.time()
-            if current_time - first_action_time < cls.time_threshold:
-                return True
-
-        redis_client.lpush(fraud_detect_key, time.time())
-        redis_client.ltrim(fraud_detect_key, 0, cls.last_actions_to_track - 1)
-        redis_client.expire(fraud_detect_key, cls.time_threshold)
-        return False
+        return bool(cls.sliding_window(keys=[fraud_detect_key], args=cls.get_script_args(time.time())))
+
+    @classmethod
+    async def adetect_suspicious_activity(cls, post_id: int) -> bool:
+        """detect_suspicious_activity for the async views"""
+        fraud_detect_key = RedisKeyTemplates.format_fraud_detect_key(post_id)
+        return bool(await cls.async_sliding_window(keys=[fraud_detect_key], args=cls.get_script_args(time.time())))
+
+    @classmethod
+    def detect_suspicious_activities(cls, post_ids: list[int]) -> list[bool]:
+        """
+        The check of detect_suspicious_activity for many actions, one script call each in a single pipeline.
+        Actions on the same post are checked in order, each one sees the ones recorded before it.
+        """
+        now, pipeline = time.time(), redis_client.pipeline(transaction=False)
+        for post_id in post_ids:
+            fraud_detect_key = RedisKeyTemplates.format_fraud_detect_key(post_id)
+            cls.sliding_window(keys=[fraud_detect_key], args=cls.get_script_args(now), client=pipeline)
+        return [bool(suspicious) for suspicious in pipeline.execute()]
 
     @classmethod
     def is_fraudulent_action(cls, post_id: int) -> bool:
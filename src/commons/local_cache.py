@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import redis
+
+from commons.messages.log_messges import LogMessages
+
+logger = logging.getLogger(__name__)
+
+
+class CacheStats:
+    """Counters of one cache tier in this process, every instance is listed in `registry` by name."""
+    registry: dict[str, 'CacheStats'] = {}
+
+    def __init__(self, name: str):
+        self.name = name
+        self._counters = Counter()
+        self._lock = threading.Lock()
+        self.registry[name] = self
+
+    def incr(self, counter: str, amount: int = 1):
+        if amount:
+            with self._lock:
+                self._counters[counter] += amount
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+    @classmethod
+    def get_all(cls) -> dict[str, dict]:
+        return {name: stats.as_dict() for name, stats in cls.registry.items()}
+
+
+class LocalLRUCache:
+    """
+    Size bounded, TTL aware LRU cache of one process, shared by its threads.
+    With a channel, deleted keys are broadcast over redis pub/sub and every process subscribed to the channel drops
+    them too, so an entry is stale at most until the message arrives, or its ttl when the subscription is down.
+    A max_size of 0 disables the cache.
+    """
+
+    def __init__(self, *, name: str, max_size: int, ttl: float, channel: str = None, redis_client: redis.Redis = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.channel = channel
+        self.redis_client = redis_client
+        self.stats = CacheStats(f"{name}:local")
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._subscriber_pid = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get_many(self, keys: list) -> dict:
+        if not self.enabled:
+            return {}
+        self.ensure_subscribed()
+
+        found, expired, now = {}, 0, time.monotonic()
+        with self._lock:
+            for key in keys:
+                if (entry := self._entries.get(key)) is None:
+                    continue
+                expires_at, value = entry
+                if expires_at <= now:
+                    del self._entries[key]
+                    expired += 1
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = value
+
+        self.stats.incr('hits', len(found))
+        self.stats.incr('misses', len(keys) - len(found))
+        self.stats.incr('expirations', expired)
+        return found
+
+    def set_many(self, mapping: dict):
+        if not self.enabled:
+            return
+        self.ensure_subscribed()
+
+        evicted, expires_at = 0, time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in mapping.items():
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                evicted += 1
+        self.stats.incr('evictions', evicted)
+
+    def delete_many(self, keys: list):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def invalidate(self, keys: list):
+        """Drop the keys here and, through the channel, in every other process."""
+        self.delete_many(keys)
+        if self.channel and keys:
+            self.redis_client.publish(self.channel, json.dumps(list(keys)))
+
+    def ensure_subscribed(self):
+        """
+        Start the subscriber thread once per process, lazily because forked gunicorn and celery
+        workers do not inherit the thread of their parent (and must not keep its entries either).
+        """
+        if not self.channel or self._subscriber_pid == os.getpid():
+            return
+        with self._lock:
+            if self._subscriber_pid == os.getpid():
+                return
+            self._entries.clear()
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.channel: self._on_invalidation})
+            pubsub.run_in_thread(sleep_time=1, daemon=True, exception_handler=self._on_subscriber_error)
+            self._subscriber_pid = os.getpid()
+
+    def _on_invalidation(self, message: dict):
+        keys = json.loads(message['data'])
+        self.delete_many(keys)
+        self.stats.incr('invalidations', len(keys))
+
+    def _on_subscriber_error(self, error, pubsub, thread):
+        """Messages may have been lost while disconnected, drop everything and let redis-py resubscribe."""
+        logger.warning(LogMessages.local_cache_subscriber_error(channel=self.channel, error=error))
+        self.clear()
+        time.sleep(1)
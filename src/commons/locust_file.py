@@ -1,23 +1,15 @@
+import os
 import random
 
 import faker
 from locust import between, HttpUser, task
 
+# The ASGI app serving the async rate view, the sync endpoints are hit on the --host of locust.
+ASGI_HOST = os.environ.get("LOCUST_ASGI_HOST", "http://0.0.0.0:8001")
 
-class DjangoRestUser(HttpUser):
-    wait_time = between(1, 5)  # Simulate waiting between 1 to 5 seconds between requests
-
-    @task
-    def get_posts(self):
-        self.client.get("/api/v1/posts/")
 
-    @task
-    def create_rate(self):
-        post_id = random.randint(1, 5)
-        score = random.randint(0, 5)
-        response = self.client.post(f"/api/v1/posts/{post_id}/rates/", json={"score": score})
-        if response.status_code != 201:
-            print(f"Failed to create rate: {response.status_code}, {response.text}")
+class RegisteredUser(HttpUser):
+    abstract = True
 
     def on_start(self):
         # Generating random username and password
@@ -32,3 +24,40 @@ class DjangoRestUser(HttpUser):
         })
         token = response.json().get("access_token")
         self.client.headers.update({"Authorization": f"Bearer {token}"})
+
+    def post_rate(self, url: str, name: str):
+        post_id = random.randint(1, 5)
+        score = random.randint(0, 5)
+        response = self.client.post(url.format(post_id=post_id), json={"score": score}, name=name)
+        if response.status_code != 201:
+            print(f"Failed to create rate: {response.status_code}, {response.text}")
+
+
+class DjangoRestUser(RegisteredUser):
+    wait_time = between(1, 5)  # Simulate waiting between 1 to 5 seconds between requests
+
+    @task
+    def get_posts(self):
+        self.client.get("/api/v1/posts/")
+
+    @task
+    def create_rate(self):
+        self.post_rate("/api/v1/posts/{post_id}/rates/", name="/api/v1/posts/[id]/rates/")
+
+
+class SyncRateUser(RegisteredUser):
+    """Rates only, on the WSGI app, the baseline of AsyncRateUser."""
+    wait_time = between(0.1, 0.5)
+
+    @task
+    def create_rate(self):
+        self.post_rate("/api/v1/posts/{post_id}/rates/", name="sync rate")
+
+
+class AsyncRateUser(RegisteredUser):
+    """Rates only, on the async view of the ASGI app."""
+    wait_time = between(0.1, 0.5)
+
+    @task
+    def create_rate(self):
+        self.post_rate(ASGI_HOST + "/api/v1/posts/{post_id}/rates/async/", name="async rate")
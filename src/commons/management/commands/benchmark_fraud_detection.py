@@ -0,0 +1,69 @@
+import statistics
+import time
+
+from django.core.management import BaseCommand
+
+from commons.fraud_detection import FraudDetection, redis_client
+
+
+def list_detect_suspicious_activity(key: str, suspicious_threshold: int, time_threshold: int, tracked: int) -> bool:
+    """The list based check that the sliding window script replaced: up to five sequential redis calls."""
+    recent_actions = redis_client.lrange(key, 0, -1)
+
+    if len(recent_actions) >= suspicious_threshold:
+        first_action_time = float(recent_actions[0])
+        if time.time() - first_action_time < time_threshold:
+            return True
+
+    redis_client.lpush(key, time.time())
+    redis_client.ltrim(key, 0, tracked - 1)
+    redis_client.expire(key, time_threshold)
+    return False
+
+
+def sliding_window_detect_suspicious_activity(key: str, suspicious_threshold: int, time_threshold: int, tracked: int):
+    now = time.time()
+    member = f"{now:.6f}:{time.perf_counter_ns()}"
+    return FraudDetection.sliding_window(
+        keys=[key], args=[now, time_threshold, suspicious_threshold, tracked, member]
+    )
+
+
+class Command(BaseCommand):
+    help = 'Compare the latency of the list based and the sliding window fraud detection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--iterations', type=int, default=2000, help='Number of checks per case')
+        parser.add_argument(
+            '-t', '--tracked', type=int, nargs='+', default=[100, 10000], help='LAST_ACTIONS_TO_TRACK values'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'implementation':<16}{'tracked':>10}{'p50 (ms)':>12}{'p99 (ms)':>12}")
+        for tracked in options['tracked']:
+            for name, detect in (
+                    ('list', list_detect_suspicious_activity),
+                    ('sliding_window', sliding_window_detect_suspicious_activity),
+            ):
+                p50, p99 = self.measure(name, detect, tracked, options['iterations'])
+                self.stdout.write(f"{name:<16}{tracked:>10}{p50:>12.3f}{p99:>12.3f}")
+
+    def measure(self, name, detect, tracked, iterations):
+        """
+        Both keys are filled up to `tracked` actions first, so every check runs against a full window.
+        The threshold is above `tracked` and the window is long enough, so no check returns early.
+        """
+        key, time_threshold, suspicious_threshold = f'benchmark:fraud_detect:{name}', 3600, tracked + 1
+        redis_client.delete(key)
+        for _ in range(tracked):
+            detect(key, suspicious_threshold, time_threshold, tracked)
+
+        latencies = []
+        for _ in range(iterations):
+            started_at = time.perf_counter()
+            detect(key, suspicious_threshold, time_threshold, tracked)
+            latencies.append((time.perf_counter() - started_at) * 1000)
+
+        redis_client.delete(key)
+        percentiles = statistics.quantiles(latencies, n=100)
+        return percentiles[49], percentiles[98]
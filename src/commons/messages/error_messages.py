@@ -16,6 +16,10 @@ class ErrorMessages(Enum):
         "message": _("Rate limit exceeded. Please try again later."),
         "code": "throttled"
     }
+    THROTTLE_COST_EXCEEDED = {
+        "message": _("This request counts as {cost} requests, the rate limit admits at most {max_cost} at once."),
+        "code": "throttle_cost_exceeded"
+    }
 
     @property
     def message(self):
@@ -4,11 +4,29 @@ from django.utils.translation import gettext as _
 class LogMessages:
     REGISTRATION_ATTEMPT = _("Attempted registration with username: {}")
     FAILED_LOGIN_ATTEMPT = _("Failed login attempt for username: {}")
-    NO_NEW_RATE = _("No new rates to apply.")
-    UPDATE_POST_STATS = _(
-        "Updated stats for post_id {post_id}: average_rates={average_rates}, total_rates={total_rates}"
-    )
     ERROR_UPDATE_POST_STATS = _("Error updating stats: {error}")
+    RECOMPUTE_POST_STATS = _(
+        "Recomputed stats of {rows} posts in {seconds:.2f}s ({rows_per_second:.0f} rows/sec)"
+    )
+    SKIP_POST_STATS_SHARD = _("Skipped post stats shard [{start_id}, {end_id}), it is locked by another run")
+    RECOMPUTE_POST_STATS_RUN = _(
+        "Recomputed stats of {rows} posts in {shards} shards ({skipped} skipped) in {seconds:.2f}s "
+        "({rows_per_second:.0f} rows/sec)"
+    )
+    LOCAL_CACHE_SUBSCRIBER_ERROR = _("Local cache subscriber of {channel} failed, cache cleared: {error}")
+    SKIP_RATE_BATCH = _("Skipped rate batch {batch_id}, it was already applied")
+    DROP_ORPHAN_RATES = _("Dropped {dropped} rates of rate batch {batch_id}, their post or user no longer exists")
+    CONSUME_RATE_STREAM_ERROR = _("Consumer {consumer} failed to apply a rate batch, it stays pending: {error}")
+    SKIP_RATE_BATCH_STATS = _("Skipped stats of rate batch {batch_id}, they were already applied")
+    APPLY_PENDING_RATES = _(
+        "Pending rates: {pushed} pushed, {flushed} flushed, {pending} pending, "
+        "{coalesced} coalesced ({coalescing_ratio:.1%}), {processing} batches processing"
+    )
+    RESUME_RATE_BATCHES = _(
+        "Replayed {replayed} buffer batches, enqueued the stats of {resumed} rate batches again, "
+        "pruned {pruned} applied batches"
+    )
+    REPLAY_RATE_BATCH_ERROR = _("Replaying the buffer batch {batch_id} failed: {error}")
 
     @classmethod
     def register_existing_user(cls, username):
@@ -19,13 +37,54 @@ class LogMessages:
         return cls.FAILED_LOGIN_ATTEMPT.format(username)
 
     @classmethod
-    def no_new_rate(cls, post_id, average_rates, total_rates):
-        return cls.NO_NEW_RATE.format(post_id=post_id, average_rates=average_rates, total_rates=total_rates)
+    def error_update_post_stats(cls, error):
+        return cls.ERROR_UPDATE_POST_STATS.format(error=error)
+
+    @classmethod
+    def recompute_post_stats(cls, rows, seconds, rows_per_second):
+        return cls.RECOMPUTE_POST_STATS.format(rows=rows, seconds=seconds, rows_per_second=rows_per_second)
 
     @classmethod
-    def update_post_stats(cls, post_id, average_rates, total_rates):
-        return cls.UPDATE_POST_STATS.format(post_id=post_id, average_rates=average_rates, total_rates=total_rates)
+    def skip_post_stats_shard(cls, start_id, end_id):
+        return cls.SKIP_POST_STATS_SHARD.format(start_id=start_id, end_id=end_id)
 
     @classmethod
-    def error_update_post_stats(cls, error):
-        return cls.ERROR_UPDATE_POST_STATS.format(error=error)
+    def recompute_post_stats_run(cls, rows, shards, skipped, seconds, rows_per_second):
+        return cls.RECOMPUTE_POST_STATS_RUN.format(
+            rows=rows, shards=shards, skipped=skipped, seconds=seconds, rows_per_second=rows_per_second
+        )
+
+    @classmethod
+    def local_cache_subscriber_error(cls, channel, error):
+        return cls.LOCAL_CACHE_SUBSCRIBER_ERROR.format(channel=channel, error=error)
+
+    @classmethod
+    def skip_rate_batch(cls, batch_id):
+        return cls.SKIP_RATE_BATCH.format(batch_id=batch_id)
+
+    @classmethod
+    def drop_orphan_rates(cls, batch_id, dropped):
+        return cls.DROP_ORPHAN_RATES.format(batch_id=batch_id, dropped=dropped)
+
+    @classmethod
+    def consume_rate_stream_error(cls, consumer, error):
+        return cls.CONSUME_RATE_STREAM_ERROR.format(consumer=consumer, error=error)
+
+    @classmethod
+    def skip_rate_batch_stats(cls, batch_id):
+        return cls.SKIP_RATE_BATCH_STATS.format(batch_id=batch_id)
+
+    @classmethod
+    def resume_rate_batches(cls, replayed, resumed, pruned):
+        return cls.RESUME_RATE_BATCHES.format(replayed=replayed, resumed=resumed, pruned=pruned)
+
+    @classmethod
+    def replay_rate_batch_error(cls, batch_id, error):
+        return cls.REPLAY_RATE_BATCH_ERROR.format(batch_id=batch_id, error=error)
+
+    @classmethod
+    def apply_pending_rates(cls, pushed, flushed, pending, coalesced, coalescing_ratio, processing):
+        return cls.APPLY_PENDING_RATES.format(
+            pushed=pushed, flushed=flushed, pending=pending, coalesced=coalesced, coalescing_ratio=coalescing_ratio,
+            processing=processing,
+        )
@@ -1,7 +1,117 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 100
+
+
+class KeysetEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder cuts datetimes to milliseconds, a keyset position needs them exact"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward only keyset (seek) pagination on the ordering of the queryset, which must end with a unique field.
+    The cursor holds the ordering values of the last row of the page and the next page starts right after them,
+    so every page is one index range scan of page_size + 1 rows: no COUNT and no OFFSET, whatever the depth.
+    """
+    page_size = StandardResultsSetPagination.page_size
+    page_size_query_param = StandardResultsSetPagination.page_size_query_param
+    max_page_size = StandardResultsSetPagination.max_page_size
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = [str(field) for field in queryset.query.order_by]
+        page_size = self.get_page_size(request)
+
+        if (position := self.decode_cursor(request)) is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+
+        rows = list(queryset.annotate(**{
+            self.keyset_alias(index): F(field.lstrip('-')) for index, field in enumerate(self.ordering)
+        })[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    @staticmethod
+    def keyset_alias(index: int) -> str:
+        return f'keyset_{index}'
+
+    def get_keyset_filter(self, position: list) -> Q:
+        """
+        (a, b) after (x, y) as `a <= x AND (a < x OR (a = x AND b < y))` for descending fields,
+        the redundant leading bound keeps the scan an index range scan on the first field.
+        """
+        lookups = [
+            (field.lstrip('-'), 'lt' if field.startswith('-') else 'gt', value)
+            for field, value in zip(self.ordering, position)
+        ]
+        after, equal = Q(), {}
+        for field, lookup, value in lookups:
+            after |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+
+        field, lookup, value = lookups[0]
+        return Q(**{f'{field}__{lookup}e': value}) & after
+
+    def encode_cursor(self, row) -> str:
+        position = [getattr(row, self.keyset_alias(index)) for index in range(len(self.ordering))]
+        cursor = json.dumps({'ordering': self.ordering, 'position': position}, cls=KeysetEncoder)
+        return base64.urlsafe_b64encode(cursor.encode()).decode()
+
+    def decode_cursor(self, request) -> list | None:
+        if not (encoded := request.query_params.get(self.cursor_query_param)):
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position = cursor['position']
+            if cursor['ordering'] != self.ordering or len(position) != len(self.ordering):
+                raise ValueError
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def get_next_link(self) -> str | None:
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
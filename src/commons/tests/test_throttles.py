@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework.exceptions import ValidationError
+
+from commons.checks import check_bulk_rate_throttles
+from commons.throttles import (
+    BulkPostRateThrottle, BulkUserHourlyPostRateThrottle, GCRAThrottle, PostRateThrottle, redis_client
+)
+from core.settings.third_parties.redis_templates import RedisKeyTemplates
+
+TEST_KEY = 'test_throttle'
+
+
+class BurstThrottle(GCRAThrottle):
+    """one request per second with bursts of 3, on a key of its own"""
+    rate = 60
+    period = 60
+    burst = 3
+
+    def get_cache_key(self, request, view):
+        return TEST_KEY
+
+
+class ShardedPostRateThrottle(PostRateThrottle):
+    rate = 60
+    period = 60
+    burst = 8
+    shards = 4
+
+
+class ShardedBulkPostRateThrottle(BulkPostRateThrottle, ShardedPostRateThrottle):
+    def get_cache_key(self, request, view):
+        return TEST_KEY
+
+
+def bulk_request(rates: int):
+    return SimpleNamespace(data={'rates': [{'post_id': post_id, 'score': 5} for post_id in range(rates)]})
+
+
+class GCRAThrottleTest(SimpleTestCase):
+    def setUp(self):
+        redis_client.delete(TEST_KEY)
+        self.addCleanup(redis_client.delete, TEST_KEY)
+
+    def test_allows_the_burst_then_denies(self):
+        throttle = BurstThrottle()
+        self.assertEqual([throttle.allow_request(None, None) for _ in range(4)], [True, True, True, False])
+
+    def test_wait_is_the_time_until_the_next_request_is_allowed(self):
+        throttle = BurstThrottle()
+        for _ in range(3):
+            throttle.allow_request(None, None)
+        self.assertEqual(throttle.wait(), 0)
+        self.assertFalse(throttle.allow_request(None, None))
+        self.assertAlmostEqual(throttle.wait(), throttle.emission_interval, delta=0.1)
+
+    def test_a_denied_request_does_not_take_a_slot(self):
+        throttle = BurstThrottle()
+        for _ in range(5):
+            throttle.allow_request(None, None)
+        self.assertAlmostEqual(throttle.wait(), throttle.emission_interval, delta=0.1)
+
+    async def test_async_requests_share_the_bucket(self):
+        throttle = BurstThrottle()
+        self.assertEqual(
+            [await throttle.aallow_request(None, None) for _ in range(4)], [True, True, True, False]
+        )
+        self.assertGreater(throttle.wait(), 0)
+
+    def test_shards_split_the_limit_and_the_burst(self):
+        throttle = ShardedPostRateThrottle()
+        self.assertEqual(throttle.emission_interval, 4)
+        self.assertEqual(throttle.get_max_cost(), 2)
+        self.assertLessEqual(
+            {throttle.get_cache_key(None, None) for _ in range(100)},
+            {RedisKeyTemplates.format_post_rate_limit_key(shard) for shard in range(4)},
+        )
+
+    def test_bulk_cost_is_the_number_of_rates(self):
+        throttle = ShardedBulkPostRateThrottle()
+        self.assertTrue(throttle.allow_request(bulk_request(2), None))
+        self.assertFalse(throttle.allow_request(bulk_request(1), None))
+
+    def test_a_cost_above_the_burst_of_a_shard_is_invalid(self):
+        with self.assertRaises(ValidationError) as context:
+            ShardedBulkPostRateThrottle().allow_request(bulk_request(3), None)
+        self.assertEqual(context.exception.get_codes(), ['throttle_cost_exceeded'])
+        self.assertIsNone(redis_client.get(TEST_KEY))
+
+    def test_bulk_rates_max_items_above_the_burst_fails_the_system_check(self):
+        max_cost = min(BulkPostRateThrottle.get_max_cost(), BulkUserHourlyPostRateThrottle.get_max_cost())
+        with override_settings(BULK_RATES_MAX_ITEMS=max_cost):
+            self.assertEqual(check_bulk_rate_throttles(None), [])
+        with override_settings(BULK_RATES_MAX_ITEMS=10 ** 9):
+            self.assertEqual({error.id for error in check_bulk_rate_throttles(None)}, {'commons.E001'})
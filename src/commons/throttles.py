@@ -1,10 +1,48 @@
-import time
+import math
+import random
 
 from django.conf import settings
-from django.core.cache import cache
+from rest_framework.exceptions import ValidationError
 from rest_framework.throttling import BaseThrottle, UserRateThrottle
 
-from core.env import env
+from commons.messages.error_messages import ErrorMessages
+from core.settings.third_parties.cache import get_async_redis_client, get_redis_client
+from core.settings.third_parties.redis_templates import RedisKeyTemplates
+
+redis_client = get_redis_client()
+async_redis_client = get_async_redis_client()
+
+"""
+Generic cell rate algorithm, the check and the update of the theoretical arrival time (tat) are one atomic step.
+The clock is the redis server time, so every app server sees the same one.
+KEYS[1]: bucket key, ARGV: emission interval (seconds per request), burst tolerance (seconds), cost (requests)
+returns {1, 0} when the request is allowed, {0, seconds until the next request is allowed} otherwise
+"""
+GCRA_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local emission_interval, tolerance, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3] or 1)
+
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+
+local new_tat = tat + emission_interval * cost
+local retry_after = new_tat - tolerance - now
+if retry_after > 0 then
+    return {0, string.format('%.6f', retry_after)}
+end
+
+redis.call('SET', KEYS[1], string.format('%.6f', new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, '0'}
+"""
+
+
+def get_bulk_rates_count(request) -> int:
+    """Number of rates of a bulk submission, at least 1, the body is validated later by the serializer"""
+    rates = request.data.get('rates') if isinstance(request.data, dict) else None
+    return max(len(rates), 1) if isinstance(rates, list) else 1
 
 
 class LoginRateThrottle(UserRateThrottle):
@@ -15,38 +53,114 @@ class RegisterRateThrottle(UserRateThrottle):
     scope = 'register'
 
 
-class UserHourlyPostRateThrottle(UserRateThrottle):
+class GCRAThrottle(BaseThrottle):
+    """
+    `rate` requests per `period` seconds with bursts of up to `burst` requests, one script call per request.
+    The limit and the burst are split evenly over `shards` keys, see PostRateThrottle.
+    """
+    rate = None
+    period = None
+    burst = None
+    shards = 1
+    gcra = redis_client.register_script(GCRA_SCRIPT)
+    async_gcra = async_redis_client.register_script(GCRA_SCRIPT)
+
+    def __init__(self):
+        self.retry_after = None
+
+    @property
+    def emission_interval(self) -> float:
+        return self.period * self.shards / self.rate
+
+    @classmethod
+    def get_max_cost(cls) -> int:
+        """The burst of one shard, the largest cost a request can ever be admitted with"""
+        return max(math.ceil(cls.burst / cls.shards), 1)
+
+    @property
+    def tolerance(self) -> float:
+        return self.emission_interval * self.get_max_cost()
+
+    def get_cache_key(self, request, view) -> str | None:
+        raise NotImplementedError('.get_cache_key() must be overridden')
+
+    def get_cost(self, request) -> int:
+        return 1
+
+    def get_checked_cost(self, request) -> int:
+        """
+        The cost of the request, a request above the burst of a shard is rejected as invalid (400)
+        since waiting never lets it through.
+        """
+        if (cost := self.get_cost(request)) > (max_cost := self.get_max_cost()):
+            raise ValidationError(
+                detail=ErrorMessages.THROTTLE_COST_EXCEEDED.message.format(cost=cost, max_cost=max_cost),
+                code=ErrorMessages.THROTTLE_COST_EXCEEDED.code,
+            )
+        return cost
+
+    def allow_request(self, request, view):
+        if (key := self.get_cache_key(request, view)) is None:
+            return True
+        allowed, retry_after = self.gcra(
+            keys=[key], args=[self.emission_interval, self.tolerance, self.get_checked_cost(request)]
+        )
+        self.retry_after = float(retry_after)
+        return bool(allowed)
+
+    async def aallow_request(self, request, view):
+        """allow_request for the async views, on the async redis client and the same keys"""
+        if (key := self.get_cache_key(request, view)) is None:
+            return True
+        allowed, retry_after = await self.async_gcra(
+            keys=[key], args=[self.emission_interval, self.tolerance, self.get_checked_cost(request)]
+        )
+        self.retry_after = float(retry_after)
+        return bool(allowed)
+
+    def wait(self):
+        """
+        Returns the number of seconds until the throttled request would be allowed.
+        """
+        return self.retry_after
+
+
+class UserHourlyPostRateThrottle(GCRAThrottle):
     scope = 'user_hourly_post_rate'
-    rate = f'{settings.MAX_RATES_PER_HOUR}/hour'
+    rate = settings.MAX_RATES_PER_HOUR
+    period = 60 * 60
+    burst = settings.MAX_RATES_PER_HOUR
 
     def get_cache_key(self, request, view):
         if request.user.is_authenticated:
-            return f"{self.scope}:{request.user.pk}"
+            return RedisKeyTemplates.format_user_post_rate_limit_key(request.user.pk)
         return None
 
 
-class PostRateThrottle(BaseThrottle):
-    rate = env.int("POST_RATE_LIMIT", 1000)
-    cache_timeout = env.int("CACHE_TIMEOUT", 3600)
-    cache_key = 'post_rate_limit'
+class PostRateThrottle(GCRAThrottle):
+    """
+    Global limit of POST_RATE_LIMIT rates per POST_RATE_LIMIT_PERIOD.
+    With POST_RATE_LIMIT_SHARDS > 1 the limit and the burst are split evenly over that many keys and every request
+    picks one at random, the global limit holds on average at the cost of a per-shard burst.
+    """
+    rate = settings.POST_RATE_LIMIT
+    period = settings.POST_RATE_LIMIT_PERIOD
+    burst = settings.POST_RATE_LIMIT_BURST
+    shards = settings.POST_RATE_LIMIT_SHARDS
 
-    def get_cache_key(self):
-        return self.cache_key
+    def get_cache_key(self, request, view):
+        return RedisKeyTemplates.format_post_rate_limit_key(random.randrange(self.shards))
 
-    def allow_request(self, request, view):
-        cache_key = self.get_cache_key()
-        request_count = cache.get(cache_key, 0)
 
-        if request_count >= self.rate:
-            """Too many requests, block further access"""
-            return False
+class BulkUserHourlyPostRateThrottle(UserHourlyPostRateThrottle):
+    """Every rate of a bulk submission counts against the hourly limit of the user, not the request."""
 
-        """ Otherwise, increment the request count"""
-        cache.incr(cache_key, 1) if cache.get(cache_key) else cache.set(cache_key, 1, self.cache_timeout)
-        return True
+    def get_cost(self, request) -> int:
+        return get_bulk_rates_count(request)
 
-    def wait(self):
-        """
-        Returns the number of seconds until the throttle is reset.
-        """
-        return self.cache_timeout - (time.time() % self.cache_timeout)
+
+class BulkPostRateThrottle(PostRateThrottle):
+    """Every rate of a bulk submission takes its own slot of the global limit."""
+
+    def get_cost(self, request) -> int:
+        return get_bulk_rates_count(request)
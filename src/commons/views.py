@@ -1,5 +1,8 @@
 from django.http import JsonResponse
 
+from commons.local_cache import CacheStats
+from core.settings.third_parties.cache import get_redis_client, get_redis_pool_stats
+
 
 def health_check(request):
     """
@@ -10,3 +13,24 @@ def health_check(request):
         'message': 'Application is healthy.'
     }
     return JsonResponse(health_status)
+
+
+def redis_pool_stats(request):
+    """
+    Usage of the shared redis connection pools of the process that served the request.
+    """
+    return JsonResponse({'pools': get_redis_pool_stats()})
+
+
+def cache_stats(request):
+    """
+    Hit, miss and eviction counters of the cache tiers of the process that served the request.
+    Redis evicts server side, so its evictions are the server wide counters of INFO stats.
+    """
+    info = get_redis_client().info('stats')
+    return JsonResponse({
+        'tiers': CacheStats.get_all(),
+        'redis_server': {
+            counter: info.get(counter) for counter in ('keyspace_hits', 'keyspace_misses', 'evicted_keys')
+        },
+    })
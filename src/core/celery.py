@@ -4,20 +4,15 @@ import os
 from celery import Celery
 from celery.schedules import crontab
 
-from core.env import env
+from core.settings.third_parties.cache import (
+    REDIS_CELERY_LOCATION, REDIS_HEALTH_CHECK_INTERVAL, REDIS_MAX_CONNECTIONS, REDIS_SOCKET_CONNECT_TIMEOUT,
+    REDIS_SOCKET_TIMEOUT
+)
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.django.local')
 
-host = env.str("REDIS_HOST", default="localhost")
-port = env.int("REDIS_PORT", default=6379)
-password = env.str("REDIS_PASSWORD", default=None)
-celery_db = env.int("REDIS_CELERY_DB", default=1)
-if password:
-    redis_url = f"redis://:{password}@{host}:{port}/{celery_db}"  # noqa
-else:
-    redis_url = f"redis://{host}:{port}/{celery_db}"  # noqa
-
-celery_app = Celery('post-rating', broker=redis_url)
+# The result backend is needed by the chord of the sharded post stats recompute.
+celery_app = Celery('post-rating', broker=REDIS_CELERY_LOCATION, backend=REDIS_CELERY_LOCATION)
 
 # Using a string here means the worker doesn't have to serialize
 # the configuration object to child processes.
@@ -36,17 +31,41 @@ celery_app.conf.task_store_errors_even_if_ignored = True
 # Set broker_connection_retry_on_startup to True
 celery_app.conf.broker_connection_retry_on_startup = True
 
+# Kombu keeps its own pools, they are sized and timed out with the same settings as the shared redis pool.
+celery_app.conf.broker_pool_limit = REDIS_MAX_CONNECTIONS
+celery_app.conf.broker_transport_options = {
+    'max_connections': REDIS_MAX_CONNECTIONS,
+    'socket_timeout': REDIS_SOCKET_TIMEOUT,
+    'socket_connect_timeout': REDIS_SOCKET_CONNECT_TIMEOUT,
+    'health_check_interval': REDIS_HEALTH_CHECK_INTERVAL,
+    'retry_on_timeout': True,
+}
+celery_app.conf.redis_max_connections = REDIS_MAX_CONNECTIONS
+celery_app.conf.redis_socket_timeout = REDIS_SOCKET_TIMEOUT
+celery_app.conf.redis_socket_connect_timeout = REDIS_SOCKET_CONNECT_TIMEOUT
+celery_app.conf.redis_backend_health_check_interval = REDIS_HEALTH_CHECK_INTERVAL
+celery_app.conf.redis_retry_on_timeout = True
+
 # Load scheduled tasks.
 celery_app.conf.beat_schedule = {
     # every friday at 03:00
     'sync_posts_stat': {
         'task': 'posts.tasks.update_post_stats_periodical',
         'schedule': crontab(hour=3, minute=0, day_of_week=5),
-        'args': ('day',)
     },
     # 10 min
     'apply_pending_rates': {
         'task': 'posts.tasks.apply_pending_rates',
         'schedule': crontab(minute='*/10'),
     },
+    # 10 min
+    'consume_rate_stream_backlog': {
+        'task': 'posts.tasks.consume_rate_stream_backlog',
+        'schedule': crontab(minute='*/10'),
+    },
+    # 10 min
+    'resume_rate_batches': {
+        'task': 'posts.tasks.resume_rate_batches',
+        'schedule': crontab(minute='*/10'),
+    },
 }
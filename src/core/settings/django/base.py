@@ -152,5 +152,6 @@ from core.settings.third_parties.jwt import *  # noqa
 from core.settings.third_parties.swagger import *  # noqa
 from core.settings.third_parties.cache import *  # noqa
 from core.settings.third_parties.fraud_config import *  # noqa
+from core.settings.third_parties.rate_config import *  # noqa
 from core.settings.third_parties.celery import *  # noqa
 from core.celery import *  # noqa
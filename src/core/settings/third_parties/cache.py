@@ -1,19 +1,150 @@
+import redis
+import redis.asyncio
+from redis.asyncio.retry import Retry as AsyncRetry
+from redis.backoff import EqualJitterBackoff
+from redis.retry import Retry
+
 from core.env import env
 
 host = env.str("REDIS_HOST", default="localhost")
 port = env.int("REDIS_PORT", default=6379)
+db = env.int("REDIS_DB", default=0)
+celery_db = env.int("REDIS_CELERY_DB", default=1)
 
-REDIS_LOCATION = f"redis://{host}:{port}"
+REDIS_LOCATION = f"redis://{host}:{port}/{db}"
+REDIS_CELERY_LOCATION = f"redis://{host}:{port}/{celery_db}"
 if password := env.str("REDIS_PASSWORD", None):
-    REDIS_LOCATION = f"redis://:{password}@{host}:{port}"
+    REDIS_LOCATION = f"redis://:{password}@{host}:{port}/{db}"
+    REDIS_CELERY_LOCATION = f"redis://:{password}@{host}:{port}/{celery_db}"
+
+# Connection pool of each process, shared by the cache, fraud detection, rate buffers and throttles.
+REDIS_MAX_CONNECTIONS = env.int("REDIS_MAX_CONNECTIONS", default=50)
+# Seconds to wait for a free connection once the pool is exhausted, instead of failing right away.
+REDIS_POOL_TIMEOUT = env.float("REDIS_POOL_TIMEOUT", default=5)
+REDIS_SOCKET_TIMEOUT = env.float("REDIS_SOCKET_TIMEOUT", default=5)
+REDIS_SOCKET_CONNECT_TIMEOUT = env.float("REDIS_SOCKET_CONNECT_TIMEOUT", default=2)
+REDIS_RETRY_ATTEMPTS = env.int("REDIS_RETRY_ATTEMPTS", default=3)
+REDIS_RETRY_BACKOFF_BASE = env.float("REDIS_RETRY_BACKOFF_BASE", default=0.01)
+REDIS_RETRY_BACKOFF_CAP = env.float("REDIS_RETRY_BACKOFF_CAP", default=0.5)
+REDIS_HEALTH_CHECK_INTERVAL = env.int("REDIS_HEALTH_CHECK_INTERVAL", default=30)
 
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.redis.RedisCache",
-        "LOCATION": REDIS_LOCATION
+        "LOCATION": REDIS_LOCATION,
+        "OPTIONS": {
+            "pool_class": "core.settings.third_parties.cache.SharedConnectionPool",
+        },
     }
 }
 # Cache time to live is 15 minutes by default.
 CACHE_TTL = env.int("CACHE_TTL_MINUTES", 15) * 60
 
 CACHE_TIMEOUT = env.int("CACHE_TIMEOUT", 60) * 60
+
+# Seconds a post without stats is cached as such, shorter since its first rate batch may land any time.
+POST_STATS_NEGATIVE_TTL = env.int("POST_STATS_NEGATIVE_TTL", default=60)
+# Seconds a post stats key outlives its logical expiry, its stale value is served while one caller refreshes it.
+POST_STATS_STALE_TTL = env.int("POST_STATS_STALE_TTL", default=60)
+# Seconds the refresh lock of a post is held at most, and seconds the other callers wait for the refresh at most.
+POST_STATS_LOCK_TIMEOUT = env.float("POST_STATS_LOCK_TIMEOUT", default=5)
+POST_STATS_LOCK_WAIT = env.float("POST_STATS_LOCK_WAIT", default=0.2)
+# XFetch beta of the probabilistic early refresh, above 1 favors earlier refreshes.
+POST_STATS_EARLY_REFRESH_BETA = env.float("POST_STATS_EARLY_REFRESH_BETA", default=1.0)
+
+# Where the post list reads the stats of a page from:
+#   "cache": one batched lookup of the post stats cache per page (in-process LRU, then redis, then PostStat).
+#   "join": a select_related('stat') join, the page and its stats are one SQL query and the cache is not used.
+POST_STATS_SOURCE = env.str("POST_STATS_SOURCE", default="cache")
+
+# Seconds a rendered page of the post list is cached for a stats version, 0 disables the page cache.
+# Bumping the version invalidates every page, the ttl bounds the staleness of changes that do not bump it.
+POST_LIST_CACHE_TTL = env.int("POST_LIST_CACHE_TTL", default=60)
+
+# Top rated posts leaderboard (GET /api/v1/posts/top/), kept in a redis sorted set trimmed to POST_LEADERBOARD_SIZE
+# posts (0 keeps every rated post). Posts are ranked by their average shrunk towards POST_LEADERBOARD_PRIOR_MEAN
+# as if they had POST_LEADERBOARD_PRIOR_RATES more rates of that score.
+POST_LEADERBOARD_SIZE = env.int("POST_LEADERBOARD_SIZE", default=1000)
+POST_LEADERBOARD_PRIOR_MEAN = env.float("POST_LEADERBOARD_PRIOR_MEAN", default=2.5)
+POST_LEADERBOARD_PRIOR_RATES = env.int("POST_LEADERBOARD_PRIOR_RATES", default=10)
+
+# In-process LRU in front of the redis post stats cache, 0 entries disables it.
+POST_STATS_LOCAL_CACHE_SIZE = env.int("POST_STATS_LOCAL_CACHE_SIZE", default=10000)
+# Upper bound of the staleness of a local entry when an invalidation message is lost.
+POST_STATS_LOCAL_CACHE_TTL = env.float("POST_STATS_LOCAL_CACHE_TTL", default=5)
+
+_connection_pools: dict[str, redis.BlockingConnectionPool] = {}
+_async_connection_pools: dict[str, redis.asyncio.BlockingConnectionPool] = {}
+
+
+def get_redis_connection_pool(url: str = REDIS_LOCATION) -> redis.BlockingConnectionPool:
+    """
+    One pool per redis url and per process, redis-py resets it in forked (gunicorn, celery) children.
+    """
+    if url not in _connection_pools:
+        _connection_pools[url] = redis.BlockingConnectionPool.from_url(
+            url,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            timeout=REDIS_POOL_TIMEOUT,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+            retry=Retry(
+                EqualJitterBackoff(cap=REDIS_RETRY_BACKOFF_CAP, base=REDIS_RETRY_BACKOFF_BASE), REDIS_RETRY_ATTEMPTS
+            ),
+            retry_on_error=[redis.ConnectionError, redis.TimeoutError],
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        )
+    return _connection_pools[url]
+
+
+def get_redis_client(url: str = REDIS_LOCATION) -> redis.Redis:
+    return redis.Redis(connection_pool=get_redis_connection_pool(url))
+
+
+def get_async_redis_client(url: str = REDIS_LOCATION) -> redis.asyncio.Redis:
+    """
+    Client of the async views, its pool has the same limits as the sync one.
+    It is bound to the event loop of its first connection, one loop per ASGI worker process.
+    """
+    if url not in _async_connection_pools:
+        _async_connection_pools[url] = redis.asyncio.BlockingConnectionPool.from_url(
+            url,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            timeout=REDIS_POOL_TIMEOUT,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+            retry=AsyncRetry(
+                EqualJitterBackoff(cap=REDIS_RETRY_BACKOFF_CAP, base=REDIS_RETRY_BACKOFF_BASE), REDIS_RETRY_ATTEMPTS
+            ),
+            retry_on_error=[redis.ConnectionError, redis.TimeoutError],
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        )
+    return redis.asyncio.Redis(connection_pool=_async_connection_pools[url])
+
+
+def get_redis_pool_stats() -> list[dict]:
+    """Usage of the pools of this process, `waiting` is not known but exhaustion shows as in_use == max."""
+    stats = []
+    for pool in _connection_pools.values():
+        available = sum(connection is not None for connection in pool.pool.queue)
+        created = len(pool._connections)
+        stats.append({
+            'host': pool.connection_kwargs.get('host'),
+            'db': pool.connection_kwargs.get('db'),
+            'max_connections': pool.max_connections,
+            'created_connections': created,
+            'in_use_connections': created - available,
+            'available_connections': available,
+        })
+    return stats
+
+
+class SharedConnectionPool(redis.BlockingConnectionPool):
+    """
+    pool_class of the django redis cache, so the cache uses the pool of `get_redis_connection_pool`
+    instead of opening a pool of its own.
+    """
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        return get_redis_connection_pool(url)
@@ -1,5 +1,7 @@
 from django.conf import settings
 
+from core.env import env
+
 DEFAULT_RENDERER_CLASSES = [
     "rest_framework.renderers.JSONRenderer",
 ]
@@ -19,3 +21,7 @@ REST_FRAMEWORK = {
         'login': '3/minute',
     }
 }
+
+# Pagination of the post list when the request does not pick one with ?pagination=page|cursor.
+#   "page": page numbers with a total count, "cursor": keyset pagination, no count and constant cost per page.
+POST_LIST_PAGINATION = env.str("POST_LIST_PAGINATION", default="page")
@@ -0,0 +1,45 @@
+from core.env import env
+
+# Number of buffered rates that triggers an in-request flush to the database.
+BULK_THRESHOLD = env.int("BULK_THRESHOLD", default=50)
+# Maximum number of rates of one bulk submission (POST /api/v1/posts/rates/bulk/).
+BULK_RATES_MAX_ITEMS = env.int("BULK_RATES_MAX_ITEMS", default=100)
+# Maximum number of rates popped from the buffer and applied in one database batch.
+PENDING_RATES_BATCH_SIZE = env.int("PENDING_RATES_BATCH_SIZE", default=500)
+# Maximum number of rates written by one upsert statement when a batch is applied.
+RATE_UPSERT_CHUNK_SIZE = env.int("RATE_UPSERT_CHUNK_SIZE", default=1000)
+# Applied rate batches ledger: a buffer batch popped and not completed, and the stats of a batch still pending, after
+# this many seconds are replayed (enqueued) again, and applied batches are forgotten after the retention, which must
+# exceed any redelivery delay of a batch.
+RATE_BATCH_STATS_RESUME_AFTER = env.int("RATE_BATCH_STATS_RESUME_AFTER", default=5 * 60)
+RATE_BATCH_LEDGER_RETENTION = env.int("RATE_BATCH_LEDGER_RETENTION", default=24 * 60 * 60)
+RATE_BATCH_STATS_MAX_RETRIES = env.int("RATE_BATCH_STATS_MAX_RETRIES", default=5)
+
+# How submitted rates reach the database:
+#   "buffer": Redis hash of the last rate of every (user, post), flushed inside the request once it holds
+#             BULK_THRESHOLD pairs (see posts.buffers).
+#   "stream": Redis Stream consumed by the `consume_rates` command, no database write in the request.
+RATE_INGESTION_BACKEND = env.str("RATE_INGESTION_BACKEND", default="buffer")
+RATE_STREAM_GROUP = env.str("RATE_STREAM_GROUP", default="rate-appliers")
+RATE_STREAM_BLOCK_MS = env.int("RATE_STREAM_BLOCK_MS", default=5000)
+# Pending entries of a consumer idle longer than this are considered abandoned and re-applied by another consumer.
+RATE_STREAM_RECLAIM_IDLE_MS = env.int("RATE_STREAM_RECLAIM_IDLE_MS", default=60000)
+
+# Hash partitions of the rate table on post_id, applied by the posts 0007 migration when set before it runs
+# (later with the `partition_rates` command). 0 keeps a plain table.
+RATE_TABLE_PARTITIONS = env.int("RATE_TABLE_PARTITIONS", default=0)
+
+# Number of posts recomputed per grouped query and upsert by the periodic post stats recompute.
+STATS_RECOMPUTE_CHUNK_SIZE = env.int("STATS_RECOMPUTE_CHUNK_SIZE", default=5000)
+# Number of posts per shard task of the periodic recompute, shards run in parallel on the celery workers.
+STATS_RECOMPUTE_SHARD_SIZE = env.int("STATS_RECOMPUTE_SHARD_SIZE", default=100000)
+# Upper bound of a shard run, its lock expires after that even if the worker died holding it.
+STATS_RECOMPUTE_LOCK_TIMEOUT = env.int("STATS_RECOMPUTE_LOCK_TIMEOUT", default=60 * 60)
+
+# Global rates accepted per POST_RATE_LIMIT_PERIOD seconds by PostRateThrottle, as a GCRA (leaky bucket) limit.
+POST_RATE_LIMIT = env.int("POST_RATE_LIMIT", default=1000)
+POST_RATE_LIMIT_PERIOD = env.int("POST_RATE_LIMIT_PERIOD", default=60 * 60)
+# Rates allowed at once on an idle bucket before they are spaced out to the limit, defaults to the whole limit.
+POST_RATE_LIMIT_BURST = env.int("POST_RATE_LIMIT_BURST", default=POST_RATE_LIMIT)
+# The limit is split over this many keys picked at random, so no single redis key takes every rate request.
+POST_RATE_LIMIT_SHARDS = env.int("POST_RATE_LIMIT_SHARDS", default=1)
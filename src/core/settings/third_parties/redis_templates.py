@@ -3,23 +3,87 @@ import dataclasses
 
 @dataclasses.dataclass(frozen=True)
 class RedisKeyTemplates:
-    PENDING_RATES: str = "pending_rates"
+    PENDING_RATES: str = "pending_rates:pairs"
+    PENDING_RATES_STATS: str = "pending_rates:stats"
+    PENDING_RATES_PROCESSING: str = "pending_rates:processing"
+    PENDING_RATES_BATCH: str = "pending_rates:batch:{batch_id}"
+    RATE_STREAM: str = "rates:stream"
     POST_STATS: str = "post:{post_id}:stats"
+    POST_STATS_INVALIDATE: str = "post_stats:invalidate"
+    POST_STATS_VERSION: str = "post_stats:version"
+    POST_LIST_PAGE: str = "post_list:{version}:{query_hash}"
     POST_STATS_LOCK: str = "post:{post_id}:stat_lock"
-    FRAUD_DETECT: str = "fraud_detect:{post_id}"
+    POST_STATS_RECOMPUTE: str = "post_stats:recompute"
+    POST_LEADERBOARD: str = "post_leaderboard:ranking"
+    POST_LEADERBOARD_STATS: str = "post_leaderboard:stats"
+    FRAUD_DETECT: str = "fraud_detect:{post_id}:window"
+    POST_RATE_LIMIT: str = "post_rate_limit:{shard}"
+    USER_POST_RATE_LIMIT: str = "user_post_rate_limit:{user_id}"
 
     @classmethod
     def format_post_stats_key(cls, post_id: int) -> str:
         return cls.POST_STATS.format(post_id=post_id)
 
+    @classmethod
+    def post_stats_invalidate_channel(cls) -> str:
+        return cls.POST_STATS_INVALIDATE
+
+    @classmethod
+    def post_stats_version_key(cls) -> str:
+        return cls.POST_STATS_VERSION
+
+    @classmethod
+    def format_post_list_page_key(cls, version: int, query_hash: str) -> str:
+        return cls.POST_LIST_PAGE.format(version=version, query_hash=query_hash)
+
     @classmethod
     def format_post_stats_lock_key(cls, post_id: int) -> str:
         return cls.POST_STATS_LOCK.format(post_id=post_id)
 
+    @classmethod
+    def format_post_stats_shard_lock_key(cls, start_id: int, end_id: int) -> str:
+        return cls.POST_STATS_LOCK.format(post_id=f"{start_id}-{end_id}")
+
+    @classmethod
+    def post_stats_recompute_key(cls) -> str:
+        return cls.POST_STATS_RECOMPUTE
+
+    @classmethod
+    def post_leaderboard_key(cls) -> str:
+        return cls.POST_LEADERBOARD
+
+    @classmethod
+    def post_leaderboard_stats_key(cls) -> str:
+        return cls.POST_LEADERBOARD_STATS
+
     @classmethod
     def format_fraud_detect_key(cls, post_id: int) -> str:
         return cls.FRAUD_DETECT.format(post_id=post_id)
 
+    @classmethod
+    def format_post_rate_limit_key(cls, shard: int) -> str:
+        return cls.POST_RATE_LIMIT.format(shard=shard)
+
+    @classmethod
+    def format_user_post_rate_limit_key(cls, user_id: int) -> str:
+        return cls.USER_POST_RATE_LIMIT.format(user_id=user_id)
+
     @classmethod
     def pending_rates_key(cls) -> str:
         return cls.PENDING_RATES
+
+    @classmethod
+    def pending_rates_stats_key(cls) -> str:
+        return cls.PENDING_RATES_STATS
+
+    @classmethod
+    def pending_rates_processing_key(cls) -> str:
+        return cls.PENDING_RATES_PROCESSING
+
+    @classmethod
+    def format_pending_rates_batch_key(cls, batch_id: str) -> str:
+        return cls.PENDING_RATES_BATCH.format(batch_id=batch_id)
+
+    @classmethod
+    def rate_stream_key(cls) -> str:
+        return cls.RATE_STREAM
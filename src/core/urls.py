@@ -3,10 +3,12 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
-from commons.views import health_check
+from commons.views import cache_stats, health_check, redis_pool_stats
 
 urlpatterns = [
                   path("health/", health_check, name="health-check"),
+                  path("health/redis-pools/", redis_pool_stats, name="redis-pool-stats"),
+                  path("health/caches/", cache_stats, name="cache-stats"),
                   path("api/v1/", include("routers.urls")),
                   path('admin/', admin.site.urls),
               ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -18,6 +18,19 @@ class PostAdmin(admin.ModelAdmin):
     readonly_fields = ('total_rates', 'average_rates')
     inlines = [RateInline]
 
+    def save_model(self, request, obj, form, change):
+        from posts.services.commands.post_list import bump_post_stats_version
+        super().save_model(request, obj, form, change)
+        bump_post_stats_version()
+
+    def delete_model(self, request, obj):
+        from posts.leaderboards import PostLeaderboard
+        from posts.services.commands.post_list import bump_post_stats_version
+        post_id = obj.id
+        super().delete_model(request, obj)
+        PostLeaderboard.remove([post_id])
+        bump_post_stats_version()
+
     def get_readonly_fields(self, request, obj=None):
         return self.readonly_fields if obj else []
 
@@ -0,0 +1,149 @@
+import json
+import time
+
+from core.settings.third_parties.cache import get_async_redis_client, get_redis_client
+from core.settings.third_parties.redis_templates import RedisKeyTemplates
+
+redis_client = get_redis_client()
+async_redis_client = get_async_redis_client()
+
+"""
+Move up to ARGV[1] (user, post) pairs of the buffer to the hash of batch ARGV[2] in one atomic step, index the batch
+by the time it was popped at and count its pairs as flushed.
+KEYS[1]: buffer hash, KEYS[2]: counters hash, KEYS[3]: batch hash, KEYS[4]: processing batches sorted set,
+returns the flat field, value list of the moved pairs
+"""
+POP_BATCH_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {}
+end
+local items = redis.call('HRANDFIELD', KEYS[1], ARGV[1], 'WITHVALUES')
+local fields = {}
+for i = 1, #items, 2 do
+    fields[#fields + 1] = items[i]
+end
+redis.call('HDEL', KEYS[1], unpack(fields))
+redis.call('HSET', KEYS[3], unpack(items))
+local time = redis.call('TIME')
+redis.call('ZADD', KEYS[4], time[1] + time[2] / 1000000, ARGV[2])
+redis.call('HINCRBY', KEYS[2], 'flushed', #fields)
+return items
+"""
+
+
+class PendingRateBuffer:
+    """
+    Buffer of submitted rates backed by a Redis hash keyed by (user, post), the last rate of a pair overwrites
+    the previous one, so a flush writes at most one rate per pair whatever the number of re-rates.
+    Every operation is one atomic round-trip, its cost does not depend on the buffer size and concurrent workers never
+    pop the same rate. The counters hash keeps the pushed and flushed totals the coalescing ratio is derived from.
+    A popped batch is kept in a hash of its own, under its batch id, until it is committed (`complete`), so the batch
+    of a worker that died or failed before that is replayed under the same id by `resume_rate_batches`.
+    """
+    key = RedisKeyTemplates.pending_rates_key()
+    stats_key = RedisKeyTemplates.pending_rates_stats_key()
+    processing_key = RedisKeyTemplates.pending_rates_processing_key()
+    pop = redis_client.register_script(POP_BATCH_SCRIPT)
+    async_pop = async_redis_client.register_script(POP_BATCH_SCRIPT)
+
+    @staticmethod
+    def _field(rate: dict) -> str:
+        return f"{rate['user_id']}:{rate['post_id']}"
+
+    @staticmethod
+    def _dumps(rate: dict) -> str:
+        return json.dumps(rate, separators=(',', ':'))
+
+    @classmethod
+    def _loads(cls, items: list) -> list[dict]:
+        """HRANDFIELD WITHVALUES replies field, value, field, value..."""
+        return [json.loads(value) for value in items[1::2]]
+
+    @classmethod
+    def _push_pipeline(cls, client, rates: list[dict]):
+        pipeline = client.pipeline()
+        pipeline.hset(cls.key, mapping={cls._field(rate): cls._dumps(rate) for rate in rates})
+        pipeline.hincrby(cls.stats_key, 'pushed', len(rates))
+        pipeline.hlen(cls.key)
+        return pipeline
+
+    @classmethod
+    def push(cls, rate: dict) -> int:
+        """Add one rate, replacing the pending rate of its pair, and return the number of pending pairs."""
+        return cls.push_many([rate])
+
+    @classmethod
+    def push_many(cls, rates: list[dict]) -> int:
+        """Add many rates with one HSET and return the number of pending pairs."""
+        return cls._push_pipeline(redis_client, rates).execute()[-1]
+
+    @classmethod
+    def _pop_keys(cls, batch_id: str) -> list[str]:
+        return [
+            cls.key, cls.stats_key, RedisKeyTemplates.format_pending_rates_batch_key(batch_id), cls.processing_key
+        ]
+
+    @classmethod
+    def pop_batch(cls, size: int, *, batch_id: str) -> list[dict]:
+        """Atomically move the rates of up to `size` pairs to the batch `batch_id` and return them."""
+        return cls._loads(cls.pop(keys=cls._pop_keys(batch_id), args=[size, batch_id]))
+
+    @classmethod
+    async def apush(cls, rate: dict) -> int:
+        return (await cls._push_pipeline(async_redis_client, [rate]).execute())[-1]
+
+    @classmethod
+    async def apop_batch(cls, size: int, *, batch_id: str) -> list[dict]:
+        return cls._loads(await cls.async_pop(keys=cls._pop_keys(batch_id), args=[size, batch_id]))
+
+    @classmethod
+    def complete(cls, batch_id: str):
+        """Forget a popped batch once its rates are committed (or were already)."""
+        pipeline = redis_client.pipeline()
+        pipeline.delete(RedisKeyTemplates.format_pending_rates_batch_key(batch_id))
+        pipeline.zrem(cls.processing_key, batch_id)
+        pipeline.execute()
+
+    @classmethod
+    def get_processing_batch_ids(cls, *, older_than: float) -> list[str]:
+        """Batches popped at least `older_than` seconds ago and never completed"""
+        return [
+            batch_id.decode()
+            for batch_id in redis_client.zrangebyscore(cls.processing_key, '-inf', time.time() - older_than)
+        ]
+
+    @classmethod
+    def get_processing_batch(cls, batch_id: str) -> tuple[list[dict], float | None]:
+        """The rates of a popped batch and the time it was popped at, None when it was completed meanwhile"""
+        pipeline = redis_client.pipeline()
+        pipeline.hvals(RedisKeyTemplates.format_pending_rates_batch_key(batch_id))
+        pipeline.zscore(cls.processing_key, batch_id)
+        values, popped_at = pipeline.execute()
+        return [json.loads(value) for value in values], popped_at
+
+    @classmethod
+    def size(cls) -> int:
+        return redis_client.hlen(cls.key)
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        Totals since the counters were created, a re-rate of a pending pair is coalesced:
+        pushed == flushed + pending + coalesced. The flushed pairs include the ones of the `processing` batches,
+        popped but not committed yet.
+        """
+        pipeline = redis_client.pipeline()
+        pipeline.hgetall(cls.stats_key)
+        pipeline.hlen(cls.key)
+        pipeline.zcard(cls.processing_key)
+        counters, pending, processing = pipeline.execute()
+        pushed, flushed = int(counters.get(b'pushed', 0)), int(counters.get(b'flushed', 0))
+        coalesced = max(pushed - flushed - pending, 0)
+        return {
+            'pushed': pushed,
+            'flushed': flushed,
+            'pending': pending,
+            'coalesced': coalesced,
+            'coalescing_ratio': coalesced / pushed if pushed else 0,
+            'processing': processing,
+        }
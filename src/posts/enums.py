@@ -18,3 +18,23 @@ class RateScoreEnum(models.IntegerChoices):
         if all(value != choice.value for choice in cls):
             raise ValueError(f"Invalid choice: {value}. Valid choices are: {[choice.value for choice in cls]}")
 
+
+class BulkRateStatusEnum(models.TextChoices):
+    ACCEPTED = "accepted", _("Accepted")
+    POST_NOT_FOUND = "post_not_found", _("Post Not Found")
+    DUPLICATE = "duplicate", _("Duplicate")
+
+
+class RateIngestionBackendEnum(models.TextChoices):
+    BUFFER = "buffer", _("Buffer")
+    STREAM = "stream", _("Stream")
+
+
+class PostStatsSourceEnum(models.TextChoices):
+    CACHE = "cache", _("Cache")
+    JOIN = "join", _("Join")
+
+
+class PostListPaginationEnum(models.TextChoices):
+    PAGE = "page", _("Page")
+    CURSOR = "cursor", _("Cursor")
@@ -0,0 +1,89 @@
+import json
+
+from django.conf import settings
+
+from core.settings.third_parties.redis_templates import RedisKeyTemplates
+from posts.buffers import redis_client
+from posts.models import PostStat
+
+"""
+Rank posts and keep their stats, then trim the ranking to its top ARGV[1] posts (0 keeps every post).
+KEYS[1]: ranking sorted set, KEYS[2]: stats hash, ARGV[2..]: score, post id, stats of every ranked post
+"""
+UPDATE_LEADERBOARD_SCRIPT = """
+for i = 2, #ARGV, 3 do
+    redis.call('ZADD', KEYS[1], ARGV[i], ARGV[i + 1])
+    redis.call('HSET', KEYS[2], ARGV[i + 1], ARGV[i + 2])
+end
+local size = tonumber(ARGV[1])
+if size > 0 then
+    local evicted = redis.call('ZRANGE', KEYS[1], 0, -size - 1)
+    for i = 1, #evicted, 1000 do
+        local chunk = {unpack(evicted, i, math.min(i + 999, #evicted))}
+        redis.call('ZREM', KEYS[1], unpack(chunk))
+        redis.call('HDEL', KEYS[2], unpack(chunk))
+    end
+end
+"""
+
+
+class PostLeaderboard:
+    """
+    Top rated posts in a Redis sorted set, updated with every batch of changed post stats, so reading the top
+    `limit` posts is O(log N + limit) and never reaches the database.
+    Posts are ranked by their Bayesian average, the average shrunk towards a prior of `prior_rates` rates of
+    `prior_mean`, so a post needs many high rates to outrank one with a long record, not a single 5 stars rate.
+    """
+    key = RedisKeyTemplates.post_leaderboard_key()
+    stats_key = RedisKeyTemplates.post_leaderboard_stats_key()
+    size = settings.POST_LEADERBOARD_SIZE
+    prior_mean = settings.POST_LEADERBOARD_PRIOR_MEAN
+    prior_rates = settings.POST_LEADERBOARD_PRIOR_RATES
+    update_leaderboard = redis_client.register_script(UPDATE_LEADERBOARD_SCRIPT)
+
+    @classmethod
+    def get_score(cls, post_stat: PostStat) -> float | None:
+        """Bayesian average of the post, None when it has no rate counted in its average"""
+        score, rates = post_stat.effective_totals(suspected_rates_threshold=settings.SUSPECTED_RATES_THRESHOLD)
+        if not rates:
+            return None
+        return (cls.prior_mean * cls.prior_rates + score) / (cls.prior_rates + rates)
+
+    @classmethod
+    def update(cls, post_stats: list[PostStat]):
+        """Rank the posts again from their new stats, the posts left without rates are removed."""
+        args, removed = [cls.size], []
+        for post_stat in post_stats:
+            if (score := cls.get_score(post_stat)) is None:
+                removed.append(post_stat.post_id)
+                continue
+            stats = {'average_rates': float(post_stat.average_rates), 'total_rates': post_stat.total_rates}
+            args.extend([score, post_stat.post_id, json.dumps(stats, separators=(',', ':'))])
+
+        pipeline = redis_client.pipeline(transaction=False)
+        if len(args) > 1:
+            cls.update_leaderboard(keys=[cls.key, cls.stats_key], args=args, client=pipeline)
+        if removed:
+            pipeline.zrem(cls.key, *removed)
+            pipeline.hdel(cls.stats_key, *removed)
+        pipeline.execute()
+
+    @classmethod
+    def remove(cls, post_ids: list[int]):
+        if post_ids:
+            pipeline = redis_client.pipeline(transaction=False)
+            pipeline.zrem(cls.key, *post_ids)
+            pipeline.hdel(cls.stats_key, *post_ids)
+            pipeline.execute()
+
+    @classmethod
+    def top(cls, limit: int) -> list[dict]:
+        """The `limit` best ranked posts with their score and stats, best first."""
+        ranking = redis_client.zrevrange(cls.key, 0, limit - 1, withscores=True)
+        if not ranking:
+            return []
+        stats = redis_client.hmget(cls.stats_key, [post_id for post_id, _ in ranking])
+        return [
+            {'post_id': int(post_id), 'score': score, **json.loads(post_stats or '{}')}
+            for (post_id, score), post_stats in zip(ranking, stats)
+        ]
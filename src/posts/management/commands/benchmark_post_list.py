@@ -0,0 +1,58 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from posts.enums import PostStatsSourceEnum
+
+
+class Command(BaseCommand):
+    help = 'Compare the latency of the post list with its stats read from the cache and joined from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--iterations', type=int, default=500, help='Number of requests per case')
+        parser.add_argument('-s', '--page-size', type=int, default=20, help='Posts per page')
+        parser.add_argument(
+            '-p', '--pagination', type=str, default='page', help='Pagination of the list, page or cursor'
+        )
+
+    def handle(self, *args, **options):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.first())
+        url = f"/api/v1/posts/?page_size={options['page_size']}&pagination={options['pagination']}"
+
+        self.stdout.write(f"{'stats source':<16}{'queries':>10}{'p50 (ms)':>12}{'p99 (ms)':>12}")
+        for source in PostStatsSourceEnum.values:
+            """the page cache is keyed on the url, with it on every case after the first would serve its pages"""
+            with override_settings(POST_STATS_SOURCE=source, POST_LIST_CACHE_TTL=0):
+                queries, p50, p99 = self.measure(client, url, options['iterations'])
+            self.stdout.write(f"{source:<16}{queries:>10}{p50:>12.3f}{p99:>12.3f}")
+
+    @staticmethod
+    def get(client, url):
+        """an error page is not a list page, it would be timed as one"""
+        if (response := client.get(url)).status_code != 200:
+            raise CommandError(f'GET {url} answered {response.status_code}: {response.content[:200]!r}')
+        return response
+
+    def measure(self, client, url, iterations):
+        """
+        The first request warms the cache up, the queries of the next one are counted whatever DEBUG is,
+        the timed requests run without capturing them. Every request resets the query log, so they are counted first.
+        """
+        self.get(client, url)
+        with CaptureQueriesContext(connection) as context:
+            self.get(client, url)
+        queries = len(context.captured_queries)
+        latencies = []
+        for _ in range(iterations):
+            started_at = time.perf_counter()
+            self.get(client, url)
+            latencies.append((time.perf_counter() - started_at) * 1000)
+
+        percentiles = statistics.quantiles(latencies, n=100)
+        return queries, percentiles[49], percentiles[98]
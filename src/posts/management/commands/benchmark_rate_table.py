@@ -0,0 +1,119 @@
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from posts.models import Post, Rate
+from posts.services.commands.post_stat import recompute_post_stats
+from posts.services.commands.rate import upsert_rates
+from posts.services.commands.rate_partition import partition_rate_table
+from posts.services.queries.rate import get_rate_table_partitions
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the rate batch upsert and the post stats recompute throughput of the plain and the hash partitioned '
+        'rate table, on synthetic rates in a transaction that is rolled back'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000, help='Synthetic posts')
+        parser.add_argument('--users', type=int, default=200, help='Synthetic users, each one rates every post')
+        parser.add_argument('--inserts', type=int, default=20000, help='Rates inserted by the measured batches')
+        parser.add_argument(
+            '-p', '--partitions', type=int, default=settings.RATE_TABLE_PARTITIONS or 16,
+            help='Number of hash partitions'
+        )
+
+    def handle(self, *args, **options):
+        if get_rate_table_partitions() is not None:
+            raise CommandError('The rate table is already partitioned, there is no plain table to compare with')
+        if options['partitions'] < 2:
+            raise CommandError('A partitioned rate table needs at least 2 partitions')
+
+        try:
+            with transaction.atomic():
+                posts, rates, new_rates = self.seed(options['posts'], options['users'], options['inserts'])
+                self.stdout.write(f"{'rate table':<16}{'inserts/s':>12}{'re-rates/s':>12}{'recomputed posts/s':>20}")
+                self.report('plain', posts, rates, new_rates)
+                partition_rate_table(partitions=options['partitions'])
+                self.report(f"{options['partitions']} partitions", posts, rates, new_rates)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    @staticmethod
+    def new_rates(posts: list[Post], users: list) -> list[dict]:
+        return [
+            {'post_id': post.id, 'user_id': user.id, 'score': random.randint(0, 5), 'is_suspected': False}
+            for user in users for post in posts
+        ]
+
+    def seed(self, post_count: int, user_count: int, insert_count: int) -> tuple[list[Post], list[dict], list[dict]]:
+        """
+        Every user rates every post, returns the posts, their rates with new scores (re-rates)
+        and the rates to insert, the ones of users of their own.
+        """
+        posts = Post.objects.bulk_create(
+            [Post(title=f'benchmark {i}', content='benchmark') for i in range(post_count)]
+        )
+        users = get_user_model().objects.bulk_create([
+            get_user_model()(username=f'benchmark_rate_table_{i}')
+            for i in range(user_count + -(-insert_count // post_count))
+        ])
+        upsert_rates(self.new_rates(posts, users[:user_count]))
+        """the conversion analyzes the partitioned table, the plain one is compared with fresh statistics too"""
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {connection.ops.quote_name(Rate._meta.db_table)}")
+        re_rates = self.new_rates(posts, users[:user_count])
+        return posts, re_rates, self.new_rates(posts, users[user_count:])[:insert_count]
+
+    def report(self, layout: str, posts: list[Post], rates: list[dict], new_rates: list[dict]):
+        inserts_per_second = self.measure_upserts(new_rates)
+        re_rates_per_second = self.measure_upserts(rates[:len(new_rates)])
+        recomputed_per_second = self.measure_recompute(posts)
+        self.stdout.write(
+            f"{layout:<16}{inserts_per_second:>12.0f}{re_rates_per_second:>12.0f}{recomputed_per_second:>20.0f}"
+        )
+
+    def measure_upserts(self, rates: list[dict]) -> float:
+        """
+        upsert_rates in batches of the size of a buffer flush, the statement of the rate batch path.
+        Rolled back so both tables hold the same rates.
+        """
+        batch_size = settings.PENDING_RATES_BATCH_SIZE
+        try:
+            with transaction.atomic():
+                started_at = time.perf_counter()
+                for start in range(0, len(rates), batch_size):
+                    upsert_rates(rates[start:start + batch_size])
+                elapsed = time.perf_counter() - started_at
+                raise _Rollback
+        except _Rollback:
+            pass
+        return len(rates) / elapsed
+
+    def measure_recompute(self, posts: list[Post]) -> float:
+        """
+        The database work of recompute_post_stats_range over the posts, chunk by chunk, without its cache and
+        leaderboard updates (the posts are rolled back). Rolled back so both tables start without post stats.
+        """
+        post_ids = sorted(post.id for post in posts)
+        chunk_size = settings.STATS_RECOMPUTE_CHUNK_SIZE
+        try:
+            with transaction.atomic():
+                started_at = time.perf_counter()
+                for start_id in range(post_ids[0], post_ids[-1] + 1, chunk_size):
+                    recompute_post_stats(start_id=start_id, end_id=min(start_id + chunk_size, post_ids[-1] + 1))
+                elapsed = time.perf_counter() - started_at
+                raise _Rollback
+        except _Rollback:
+            pass
+        return len(post_ids) / elapsed
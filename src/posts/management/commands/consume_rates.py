@@ -0,0 +1,59 @@
+import logging
+import signal
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from posts.services.commands.rate import consume_rate_stream, reclaim_rate_stream
+from commons.messages.log_messges import LogMessages
+from posts.streams import RateStream
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Consume the rate stream as a member of the consumer group and apply the rates in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-c', '--consumer', type=str, help='Consumer name, unique per process')
+        parser.add_argument(
+            '-b', '--batch-size', type=int, default=settings.PENDING_RATES_BATCH_SIZE,
+            help='Number of rates applied per batch'
+        )
+        parser.add_argument(
+            '--block-ms', type=int, default=settings.RATE_STREAM_BLOCK_MS,
+            help='How long to wait for new rates before checking for abandoned batches'
+        )
+
+    def handle(self, *args, **options):
+        consumer = options['consumer'] or RateStream.consumer_name()
+        batch_size, block_ms = options['batch_size'], options['block_ms']
+        reclaim_interval = settings.RATE_STREAM_RECLAIM_IDLE_MS / 1000
+
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        RateStream.ensure_group()
+        self.stdout.write(f'Consuming {RateStream.key} as {consumer} in group {RateStream.group}')
+
+        last_reclaim = 0
+        while self.running:
+            try:
+                if time.monotonic() - last_reclaim >= reclaim_interval:
+                    last_reclaim = time.monotonic()
+                    if reclaimed := reclaim_rate_stream(consumer=consumer, batch_size=batch_size):
+                        self.stdout.write(self.style.WARNING(f'Re-applied {reclaimed} abandoned rates'))
+
+                consume_rate_stream(consumer=consumer, batch_size=batch_size, block_ms=block_ms)
+            except Exception as error:
+                """the failed batch is left pending and retried by a later reclaim, the consumer keeps going"""
+                logger.exception(LogMessages.consume_rate_stream_error(consumer=consumer, error=error))
+                time.sleep(block_ms / 1000)
+
+        self.stdout.write(self.style.SUCCESS(f'Consumer {consumer} stopped'))
+
+    def stop(self, signum, frame):
+        """finish the batch in progress, it is acked before the loop exits"""
+        self.running = False
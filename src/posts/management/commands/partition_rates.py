@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from posts.services.commands.rate_partition import partition_rate_table
+
+
+class Command(BaseCommand):
+    help = (
+        'Convert the rate table to a table hash partitioned on post_id. It is locked for the whole copy, '
+        'run it in a maintenance window'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-p', '--partitions', type=int, default=settings.RATE_TABLE_PARTITIONS or 16,
+            help='Number of hash partitions'
+        )
+
+    def handle(self, *args, **options):
+        if options['partitions'] < 2:
+            raise CommandError('A partitioned rate table needs at least 2 partitions')
+        try:
+            report = partition_rate_table(partitions=options['partitions'])
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(
+            f"Copied {report['rows']} rates into {report['partitions']} partitions in {report['seconds']:.2f}s"
+        )
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from posts.leaderboards import PostLeaderboard
+from posts.models import PostStat
+
+
+class Command(BaseCommand):
+    help = 'Rank every rated post in the top rated leaderboard, e.g. after deploying it or flushing redis'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-c', '--chunk-size', type=int, default=settings.STATS_RECOMPUTE_CHUNK_SIZE,
+            help='Number of post stats read and ranked per chunk'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size, ranked, last_post_id = options['chunk_size'], 0, 0
+        while post_stats := list(
+            PostStat.objects.filter(post_id__gt=last_post_id, total_rates__gt=0).order_by('post_id')[:chunk_size]
+        ):
+            PostLeaderboard.update(post_stats)
+            ranked += len(post_stats)
+            last_post_id = post_stats[-1].post_id
+        self.stdout.write(f'Ranked {ranked} posts, {PostLeaderboard.key} keeps the top {PostLeaderboard.size or "all"}')
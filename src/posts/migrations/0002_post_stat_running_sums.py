@@ -0,0 +1,63 @@
+# Generated by Django 5.1.1 on 2026-10-18 12:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+"""
+Upsert the running sums of every post with rates, a post without a PostStat row gets one (with its average), otherwise
+the first re-rate of one of its rates would take its old score out of zero sums.
+"""
+BACKFILL_RUNNING_SUMS_SQL = """
+INSERT INTO posts_poststat (
+    post_id, total_rates, total_score, suspected_rates, suspected_score, average_rates, created_at, updated_at
+)
+SELECT post_id, total_rates, total_score, suspected_rates, suspected_score,
+       COALESCE(ROUND(CASE
+           WHEN suspected_rates < total_rates * %s THEN total_score::numeric / NULLIF(total_rates, 0)
+           ELSE (total_score - suspected_score)::numeric / NULLIF(total_rates - suspected_rates, 0)
+       END, 2), 0),
+       now(), now()
+FROM (
+    SELECT post_id,
+           COUNT(*) AS total_rates,
+           COALESCE(SUM(score), 0) AS total_score,
+           COUNT(*) FILTER (WHERE is_suspected) AS suspected_rates,
+           COALESCE(SUM(score) FILTER (WHERE is_suspected), 0) AS suspected_score
+    FROM posts_rate
+    GROUP BY post_id
+) AS totals
+ON CONFLICT (post_id) DO UPDATE
+SET total_rates = EXCLUDED.total_rates,
+    total_score = EXCLUDED.total_score,
+    suspected_rates = EXCLUDED.suspected_rates,
+    suspected_score = EXCLUDED.suspected_score;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poststat',
+            name='suspected_rates',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='poststat',
+            name='suspected_score',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='poststat',
+            name='total_score',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunSQL(
+            sql=[(BACKFILL_RUNNING_SUMS_SQL, [settings.SUSPECTED_RATES_THRESHOLD])],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.1.1 on 2026-10-18 12:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+"""
+Upsert the histogram of every post with rates, a post still without a PostStat row gets one with its running sums too.
+"""
+BACKFILL_HISTOGRAM_SQL = """
+INSERT INTO posts_poststat (
+    post_id, total_rates, total_score, suspected_rates, suspected_score, average_rates,
+    score_0_rates, score_1_rates, score_2_rates, score_3_rates, score_4_rates, score_5_rates, created_at, updated_at
+)
+SELECT post_id, total_rates, total_score, suspected_rates, suspected_score,
+       COALESCE(ROUND(CASE
+           WHEN suspected_rates < total_rates * %s THEN total_score::numeric / NULLIF(total_rates, 0)
+           ELSE (total_score - suspected_score)::numeric / NULLIF(total_rates - suspected_rates, 0)
+       END, 2), 0),
+       score_0_rates, score_1_rates, score_2_rates, score_3_rates, score_4_rates, score_5_rates, now(), now()
+FROM (
+    SELECT post_id,
+           COUNT(*) AS total_rates,
+           COALESCE(SUM(score), 0) AS total_score,
+           COUNT(*) FILTER (WHERE is_suspected) AS suspected_rates,
+           COALESCE(SUM(score) FILTER (WHERE is_suspected), 0) AS suspected_score,
+           COUNT(*) FILTER (WHERE score = 0) AS score_0_rates,
+           COUNT(*) FILTER (WHERE score = 1) AS score_1_rates,
+           COUNT(*) FILTER (WHERE score = 2) AS score_2_rates,
+           COUNT(*) FILTER (WHERE score = 3) AS score_3_rates,
+           COUNT(*) FILTER (WHERE score = 4) AS score_4_rates,
+           COUNT(*) FILTER (WHERE score = 5) AS score_5_rates
+    FROM posts_rate
+    GROUP BY post_id
+) AS histogram
+ON CONFLICT (post_id) DO UPDATE
+SET score_0_rates = EXCLUDED.score_0_rates,
+    score_1_rates = EXCLUDED.score_1_rates,
+    score_2_rates = EXCLUDED.score_2_rates,
+    score_3_rates = EXCLUDED.score_3_rates,
+    score_4_rates = EXCLUDED.score_4_rates,
+    score_5_rates = EXCLUDED.score_5_rates;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_post_stat_running_sums'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poststat',
+            name='score_0_rates',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='poststat',
+            name='score_1_rates',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='poststat',
+            name='score_2_rates',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='poststat',
+            name='score_3_rates',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='poststat',
+            name='score_4_rates',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='poststat',
+            name='score_5_rates',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunSQL(
+            sql=[(BACKFILL_HISTOGRAM_SQL, [settings.SUSPECTED_RATES_THRESHOLD])],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_post_created_at_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppliedRateBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created_at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated_at')),
+                ('batch_id', models.CharField(max_length=64, unique=True)),
+                ('rates', models.PositiveIntegerField(default=0)),
+                ('scores', models.JSONField(default=dict)),
+                ('stats_applied_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Applied Rate Batch',
+                'verbose_name_plural': 'Applied Rate Batches',
+                'indexes': [
+                    models.Index(
+                        condition=models.Q(('stats_applied_at__isnull', True)),
+                        fields=['created_at'],
+                        name='rate_batch_pending_stats_idx',
+                    ),
+                ],
+            },
+        ),
+    ]
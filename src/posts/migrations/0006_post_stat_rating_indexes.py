@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:25
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """built concurrently, the post stats table takes rate batches while the indexes are built"""
+    atomic = False
+
+    dependencies = [
+        ('posts', '0005_applied_rate_batch'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='poststat',
+            index=models.Index(fields=['average_rates', 'post'], name='post_stat_average_rates_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='poststat',
+            index=models.Index(fields=['total_rates', 'post'], name='post_stat_total_rates_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:50
+
+from django.conf import settings
+from django.db import migrations
+
+
+def partition_rate_table(apps, schema_editor):
+    """Opt-in: only with RATE_TABLE_PARTITIONS set, the model state does not change either way."""
+    from posts.services.commands.rate_partition import partition_rate_table
+    from posts.services.queries.rate import get_rate_table_partitions
+
+    if settings.RATE_TABLE_PARTITIONS and get_rate_table_partitions() is None:
+        partition_rate_table(partitions=settings.RATE_TABLE_PARTITIONS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_post_stat_rating_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_rate_table, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.1 on 2026-10-18 14:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+"""prefixes of the unique (post, user) index: the one of Rate.Meta and the one of the post foreign key"""
+REDUNDANT_INDEXES = [
+    models.Index(fields=['post', 'user'], name='posts_rate_post_id_f0f8b4_idx'),
+    models.Index(fields=['post'], name='posts_rate_post_id_adf63ec8'),
+]
+RATE_INDEXES = [
+    models.Index(fields=['post', 'is_suspected'], include=['score'], name='rate_post_suspected_score_idx'),
+]
+
+
+def _concurrently() -> bool:
+    """postgres can not build or drop the indexes of a partitioned rate table concurrently"""
+    from posts.services.queries.rate import get_rate_table_partitions
+
+    return get_rate_table_partitions() is None
+
+
+def add_rate_indexes(apps, schema_editor):
+    Rate, concurrently = apps.get_model('posts', 'Rate'), _concurrently()
+    for index in RATE_INDEXES:
+        schema_editor.add_index(Rate, index, concurrently=concurrently)
+    for index in REDUNDANT_INDEXES:
+        schema_editor.remove_index(Rate, index, concurrently=concurrently)
+
+
+def remove_rate_indexes(apps, schema_editor):
+    Rate, concurrently = apps.get_model('posts', 'Rate'), _concurrently()
+    for index in REDUNDANT_INDEXES:
+        schema_editor.add_index(Rate, index, concurrently=concurrently)
+    for index in RATE_INDEXES:
+        schema_editor.remove_index(Rate, index, concurrently=concurrently)
+
+
+class Migration(migrations.Migration):
+    """built concurrently on a plain table, the rate table takes rate batches while the indexes are built"""
+    atomic = False
+
+    dependencies = [
+        ('posts', '0007_partition_rate_table'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveIndex(model_name='rate', name='posts_rate_post_id_f0f8b4_idx'),
+                migrations.AlterField(
+                    model_name='rate',
+                    name='post',
+                    field=models.ForeignKey(
+                        db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='rates',
+                        to='posts.post'
+                    ),
+                ),
+                *[migrations.AddIndex(model_name='rate', index=index) for index in RATE_INDEXES],
+            ],
+            database_operations=[
+                migrations.RunPython(add_rate_indexes, remove_rate_indexes),
+            ],
+        ),
+    ]
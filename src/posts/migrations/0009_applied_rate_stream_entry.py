@@ -0,0 +1,26 @@
+# Generated by Django 5.1.1 on 2026-10-18 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_rate_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppliedRateStreamEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_id', models.CharField(max_length=64, unique=True)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stream_entries', to='posts.appliedratebatch')),
+            ],
+            options={
+                'verbose_name': 'Applied Rate Stream Entry',
+                'verbose_name_plural': 'Applied Rate Stream Entries',
+            },
+        ),
+    ]
@@ -1,5 +1,7 @@
-__all__ = ("Post", "Rate", "PostStat")
+__all__ = ("Post", "Rate", "PostStat", "AppliedRateBatch", "AppliedRateStreamEntry")
 
+from posts.models.applied_rate_batch import AppliedRateBatch
+from posts.models.applied_rate_stream_entry import AppliedRateStreamEntry
 from posts.models.post import Post
 from posts.models.post_stat import PostStat
 from posts.models.rate import Rate
@@ -0,0 +1,28 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from commons.models import BaseModel
+
+
+class AppliedRateBatch(BaseModel):
+    """
+    Ledger of the rate batches written to the database, the row is created in the transaction of the rates,
+    so a batch delivered again finds it and is skipped. It also holds the stats deltas of the batch until the
+    stats task applies them, in its own transaction, and sets stats_applied_at.
+    """
+    batch_id = models.CharField(max_length=64, unique=True)
+    rates = models.PositiveIntegerField(default=0)
+    scores = models.JSONField(default=dict)
+    stats_applied_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('Applied Rate Batch')
+        verbose_name_plural = _('Applied Rate Batches')
+        indexes = [
+            models.Index(fields=['created_at'], name='rate_batch_pending_stats_idx', condition=models.Q(
+                stats_applied_at__isnull=True
+            )),
+        ]
+
+    def __str__(self):
+        return self.batch_id
@@ -0,0 +1,21 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from posts.models.applied_rate_batch import AppliedRateBatch
+
+
+class AppliedRateStreamEntry(models.Model):
+    """
+    Rate stream entries written by a batch of the ledger, recorded in the transaction of its rates. An entry delivered
+    again is found here whatever batch it is read in, so it is applied once even when the batches are cut differently
+    (another batch size, a reclaim of part of a batch). Pruned with its batch.
+    """
+    entry_id = models.CharField(max_length=64, unique=True)
+    batch = models.ForeignKey(AppliedRateBatch, on_delete=models.CASCADE, related_name='stream_entries')
+
+    class Meta:
+        verbose_name = _('Applied Rate Stream Entry')
+        verbose_name_plural = _('Applied Rate Stream Entries')
+
+    def __str__(self):
+        return self.entry_id
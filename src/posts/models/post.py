@@ -11,6 +11,9 @@ class Post(BaseModel):
     class Meta:
         verbose_name = _('post')
         verbose_name_plural = _('posts')
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='post_created_at_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -1,7 +1,11 @@
 from django.db import models
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, FloatField, Value, When
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.db.models.lookups import LessThan
 from django.utils.translation import gettext_lazy as _
 
 from commons.models import BaseModel
+from posts.enums import RateScoreEnum
 from posts.models import Post
 
 
@@ -9,7 +13,66 @@ class PostStat(BaseModel):
     post = models.OneToOneField(Post, on_delete=models.CASCADE, related_name='stat')
     average_rates = models.DecimalField(max_digits=3, decimal_places=2, default=0)
     total_rates = models.PositiveIntegerField(default=0)
+    total_score = models.PositiveBigIntegerField(default=0)
+    suspected_rates = models.PositiveIntegerField(default=0)
+    suspected_score = models.PositiveBigIntegerField(default=0)
+    """histogram of all rates, one counter per score"""
+    score_0_rates = models.PositiveIntegerField(default=0)
+    score_1_rates = models.PositiveIntegerField(default=0)
+    score_2_rates = models.PositiveIntegerField(default=0)
+    score_3_rates = models.PositiveIntegerField(default=0)
+    score_4_rates = models.PositiveIntegerField(default=0)
+    score_5_rates = models.PositiveIntegerField(default=0)
 
     class Meta:
         verbose_name = _('Post Stat')
         verbose_name_plural = _('Post Stats')
+        indexes = [
+            models.Index(fields=['average_rates', 'post'], name='post_stat_average_rates_idx'),
+            models.Index(fields=['total_rates', 'post'], name='post_stat_total_rates_idx'),
+        ]
+
+    @staticmethod
+    def histogram_field(score: int) -> str:
+        return f'score_{score}_rates'
+
+    @classmethod
+    def histogram_fields(cls) -> list[str]:
+        return [cls.histogram_field(score) for score in RateScoreEnum.values]
+
+    @property
+    def distribution(self) -> list[int]:
+        """number of rates per score, indexed by score"""
+        return [getattr(self, field) for field in self.histogram_fields()]
+
+    def effective_totals(self, *, suspected_rates_threshold: float) -> tuple[int, int]:
+        """(score, rates) the average is derived from, the rule of average_rates_expression"""
+        if self.suspected_rates < self.total_rates * suspected_rates_threshold:
+            return self.total_score, self.total_rates
+        return self.total_score - self.suspected_score, self.total_rates - self.suspected_rates
+
+    @staticmethod
+    def average_rates_expression(
+            *, total_score=F('total_score'), total_rates=F('total_rates'), suspected_score=F('suspected_score'),
+            suspected_rates=F('suspected_rates'), suspected_rates_threshold: float
+    ):
+        """
+        SQL expression of the average derived from the integer sums, suspected rates are left out of the average
+        once they reach `suspected_rates_threshold` of all rates.
+        """
+        decimal = DecimalField(max_digits=20, decimal_places=4)
+        return Coalesce(
+            Case(
+                When(
+                    LessThan(
+                        suspected_rates,
+                        ExpressionWrapper(total_rates * Value(suspected_rates_threshold), output_field=FloatField())
+                    ),
+                    then=Cast(total_score, decimal) / NullIf(total_rates, 0)
+                ),
+                default=Cast(total_score - suspected_score, decimal) / NullIf(total_rates - suspected_rates, 0),
+                output_field=decimal,
+            ),
+            Value(0),
+            output_field=decimal,
+        )
@@ -9,7 +9,7 @@ User = get_user_model()
 
 
 class Rate(BaseModel):
-    post = models.ForeignKey("Post", on_delete=models.CASCADE, related_name='rates')
+    post = models.ForeignKey("Post", on_delete=models.CASCADE, related_name='rates', db_index=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='rates')
     score = models.IntegerField(
         null=True,
@@ -20,9 +20,13 @@ class Rate(BaseModel):
     is_suspected = models.BooleanField(default=False)
 
     class Meta:
+        """
+        post_id leads every index, so the post foreign key needs none of its own. The unique (post, user) index serves
+        the lookups of one rate, (post, is_suspected) covers the score for the index-only per post aggregates.
+        """
         unique_together = ('post', 'user')
         indexes = [
-            models.Index(fields=['post', 'user']),
+            models.Index(fields=['post', 'is_suspected'], include=['score'], name='rate_post_suspected_score_idx'),
         ]
 
     def __str__(self):
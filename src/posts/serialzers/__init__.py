@@ -1,4 +1,9 @@
-__all__ = ("PostSerializer", "RateSerializer")
+__all__ = (
+    "PostSerializer", "PostDistributionSerializer", "PostListFilterSerializer", "TopPostSerializer",
+    "TopPostsQuerySerializer", "RateSerializer", "BulkRateSerializer",
+)
 
-from posts.serialzers.post import PostSerializer
-from posts.serialzers.rate import RateSerializer
+from posts.serialzers.post import (
+    PostDistributionSerializer, PostListFilterSerializer, PostSerializer, TopPostSerializer, TopPostsQuerySerializer
+)
+from posts.serialzers.rate import BulkRateSerializer, RateSerializer
@@ -1,19 +1,93 @@
+from decimal import Decimal
+
+from django.db import models
 from rest_framework import serializers
 
+from posts.enums import PostStatsSourceEnum
 from posts.models.post import Post
-from posts.services.queries.post_stat import get_post_stat
+from posts.services.queries.post_stat import get_joined_post_stats, get_post_stat, get_post_stats
+
+
+class PostListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        """resolve the stats of the whole page at once, the child serializers read them from the context"""
+        posts = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        if self.context.get('post_stats_source') == PostStatsSourceEnum.JOIN:
+            self.context['post_stats'] = get_joined_post_stats(posts=posts)
+        else:
+            self.context['post_stats'] = get_post_stats(post_ids=[post.id for post in posts])
+        return super().to_representation(posts)
 
 
 class PostSerializer(serializers.ModelSerializer):
     average_rates = serializers.SerializerMethodField()
     total_rates = serializers.SerializerMethodField()
+    distribution = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
-        fields = ('id', 'title', 'content', 'average_rates', 'total_rates')
+        fields = ('id', 'title', 'content', 'average_rates', 'total_rates', 'distribution')
+        list_serializer_class = PostListSerializer
+
+    def get_fields(self):
+        """distribution is optional, it is only rendered when the view asks for it"""
+        fields = super().get_fields()
+        if not self.context.get('include_distribution'):
+            fields.pop('distribution')
+        return fields
+
+    def get_stat(self, obj) -> dict:
+        if (stat := self.context.get('post_stats', {}).get(obj.id)) is None:
+            stat = get_post_stat(post_id=obj.id)
+        return stat
 
     def get_average_rates(self, obj):
-        return get_post_stat(post_id=obj.id).get('average_rates')
+        return self.get_stat(obj).get('average_rates')
 
     def get_total_rates(self, obj):
-        return get_post_stat(post_id=obj.id).get('total_rates')
+        return self.get_stat(obj).get('total_rates')
+
+    def get_distribution(self, obj):
+        return self.get_stat(obj).get('distribution')
+
+
+class PostDistributionSerializer(serializers.Serializer):
+    post_id = serializers.IntegerField()
+    average_rates = serializers.DecimalField(max_digits=3, decimal_places=2, coerce_to_string=False)
+    total_rates = serializers.IntegerField()
+    distribution = serializers.DictField(child=serializers.IntegerField())
+    median = serializers.IntegerField(allow_null=True)
+    percentiles = serializers.DictField(child=serializers.IntegerField(allow_null=True))
+
+
+class PostListFilterSerializer(serializers.Serializer):
+    """?min_/max_ range filters of the post list on the post stats, bounds are inclusive"""
+    min_average_rates = serializers.DecimalField(
+        max_digits=3, decimal_places=2, min_value=Decimal(0), max_value=Decimal(5), required=False
+    )
+    max_average_rates = serializers.DecimalField(
+        max_digits=3, decimal_places=2, min_value=Decimal(0), max_value=Decimal(5), required=False
+    )
+    min_total_rates = serializers.IntegerField(min_value=0, required=False)
+    max_total_rates = serializers.IntegerField(min_value=0, required=False)
+
+    lookups = {
+        'min_average_rates': 'stat__average_rates__gte',
+        'max_average_rates': 'stat__average_rates__lte',
+        'min_total_rates': 'stat__total_rates__gte',
+        'max_total_rates': 'stat__total_rates__lte',
+    }
+
+    def get_filters(self) -> dict:
+        return {self.lookups[field]: value for field, value in self.validated_data.items()}
+
+
+class TopPostsQuerySerializer(serializers.Serializer):
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+
+class TopPostSerializer(serializers.Serializer):
+    post_id = serializers.IntegerField()
+    score = serializers.FloatField()
+    average_rates = serializers.FloatField()
+    total_rates = serializers.IntegerField()
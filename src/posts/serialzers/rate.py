@@ -1,9 +1,10 @@
+from django.conf import settings
 from rest_framework import serializers
 
 from commons.fraud_detection import FraudDetection
-from posts.enums import RateScoreEnum
+from posts.enums import BulkRateStatusEnum, RateScoreEnum
 from posts.models import Rate
-from posts.services.commands.rate import update_or_create_rate
+from posts.services.commands.rate import submit_bulk_rates, update_or_create_rate
 
 
 class RateSerializer(serializers.ModelSerializer):
@@ -33,3 +34,27 @@ class RateSerializer(serializers.ModelSerializer):
             'post': validated_data['post'],
             'score': validated_data['score'],
         }
+
+
+class RateScoreSerializer(serializers.Serializer):
+    """plain ints, the validation messages format the limits with str() which is the lazy label of the enum"""
+    score = serializers.IntegerField(
+        min_value=RateScoreEnum.ZERO_STARS.value, max_value=RateScoreEnum.FIVE_STARS.value
+    )
+
+
+class BulkRateItemSerializer(serializers.Serializer):
+    post_id = serializers.IntegerField(min_value=1)
+    score = serializers.IntegerField(
+        min_value=RateScoreEnum.ZERO_STARS.value, max_value=RateScoreEnum.FIVE_STARS.value
+    )
+    status = serializers.ChoiceField(choices=BulkRateStatusEnum.choices, read_only=True)
+    is_suspected = serializers.BooleanField(read_only=True)
+
+
+class BulkRateSerializer(serializers.Serializer):
+    user = serializers.HiddenField(default=serializers.CurrentUserDefault())
+    rates = BulkRateItemSerializer(many=True, allow_empty=False, max_length=settings.BULK_RATES_MAX_ITEMS)
+
+    def create(self, validated_data):
+        return {'rates': submit_bulk_rates(user_id=validated_data['user'].id, items=validated_data['rates'])}
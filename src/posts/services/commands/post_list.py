@@ -0,0 +1,16 @@
+import time
+
+from core.settings.third_parties.redis_templates import RedisKeyTemplates
+from posts.services.queries.post_list import redis_client
+
+
+def bump_post_stats_version() -> int:
+    """
+    Invalidate every cached page of the post list at once: pages are keyed by the version,
+    the ones of older versions are never read again and expire on their own.
+    """
+    key = RedisKeyTemplates.post_stats_version_key()
+    pipeline = redis_client.pipeline(transaction=True)
+    pipeline.hincrby(key, 'version', 1)
+    pipeline.hset(key, 'modified_at', int(time.time()))
+    return pipeline.execute()[0]
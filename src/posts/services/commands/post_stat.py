@@ -1,32 +1,187 @@
-import logging
+import time
 
 from django.conf import settings
-from django.core.cache import cache
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Max, Min, Value, When
+from django.db.models.functions import Now
 
-from commons.messages.log_messges import LogMessages
-from core.settings.third_parties.redis_templates import RedisKeyTemplates
-from posts.models import PostStat
+from posts.enums import RateScoreEnum
+from posts.leaderboards import PostLeaderboard
+from posts.models import AppliedRateBatch, Post, PostStat, Rate
+from posts.services.queries.post_stat import get_post_stat_cache_entry, local_post_stats, set_cached_post_stats
+
+"""PostStat running sum -> key of its delta in the scores of a rate batch"""
+POST_STAT_DELTA_FIELDS = {
+    'total_score': 'score',
+    'total_rates': 'count',
+    'suspected_score': 'suspected_score',
+    'suspected_rates': 'suspected_count',
+    **{field: field for field in PostStat.histogram_fields()},
+}
 
-logger = logging.getLogger(__name__)
 
 def update_cache_post_stats(*, post_stats: list[PostStat]):
     """
-    we can use mSet of redis to set multiple keys at once
+    set all the keys at once with one pipelined mSet of redis, then drop them from the in-process cache of every worker,
+    and rank the posts again in the leaderboard
     """
-    for post_stat in post_stats:
-        stats = {"average_rates": post_stat.average_rates, "total_rates": post_stat.total_rates}
-        key = RedisKeyTemplates.format_post_stats_key(post_id=post_stat.id)
-        cache.set(key, stats, settings.CACHE_TIMEOUT)
+    set_cached_post_stats({post_stat.post_id: get_post_stat_cache_entry(post_stat) for post_stat in post_stats})
+    local_post_stats.invalidate([post_stat.post_id for post_stat in post_stats])
+    PostLeaderboard.update(post_stats)
+
+
+def _delta_expression(scores: dict[int, dict], delta_key: str):
+    return Case(
+        *[When(post_id=post_id, then=Value(delta[delta_key])) for post_id, delta in scores.items() if delta[delta_key]],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
 
 
-def update_post_stat(post, average_rates, total_rates):
+def increment_post_stats(*, scores: dict[int, dict]) -> list[PostStat]:
+    """
+    Add the per post deltas of a rate batch to the running sums and derive the average from the incremented sums,
+    in one UPDATE of F() increments, so no concurrent batch lands in between. No stat instance is read and written back.
+    """
+    post_ids = list(scores)
     with transaction.atomic():
-        PostStat.objects.filter(post_id=post.id).update(
-            average_rates=average_rates,
-            total_rates=total_rates
+        PostStat.objects.bulk_create([PostStat(post_id=post_id) for post_id in post_ids], ignore_conflicts=True)
+
+        post_stats = PostStat.objects.filter(post_id__in=post_ids)
+        increments = {
+            field: F(field) + _delta_expression(scores, delta_key)
+            for field, delta_key in POST_STAT_DELTA_FIELDS.items()
+        }
+        post_stats.update(
+            **increments,
+            average_rates=PostStat.average_rates_expression(
+                total_score=increments['total_score'],
+                total_rates=increments['total_rates'],
+                suspected_score=increments['suspected_score'],
+                suspected_rates=increments['suspected_rates'],
+                suspected_rates_threshold=settings.SUSPECTED_RATES_THRESHOLD,
+            ),
+            updated_at=Now(),
         )
-    cache.delete(RedisKeyTemplates.format_post_stats_key(post_id=post.id))
-    logger.info(
-        LogMessages.update_post_stats(post_id=post.id, average_rates=average_rates, total_rates=total_rates)
+        return list(post_stats)
+
+
+"""PostStat running sum -> its aggregate over the rates of a post"""
+RATE_AGGREGATES_SQL = {
+    'total_score': 'COALESCE(SUM(rate.score), 0)',
+    'total_rates': 'COUNT(rate.post_id)',
+    'suspected_score': 'COALESCE(SUM(rate.score) FILTER (WHERE rate.is_suspected), 0)',
+    'suspected_rates': 'COUNT(rate.post_id) FILTER (WHERE rate.is_suspected)',
+    **{
+        PostStat.histogram_field(score): f'COUNT(rate.post_id) FILTER (WHERE rate.score = {score})'
+        for score in RateScoreEnum.values
+    },
+}
+
+"""
+Running sums of the locked PostStat rows with %(start_id)s <= post_id < %(end_id)s, from one grouped aggregate of their
+rates. The rates of a ledger batch whose stats are still pending are in the aggregate already, its deltas are taken out
+since its stats task adds them once the locks are released. Rows of posts without rates are only written when their
+sums are stale, returns the post ids of the written rows.
+"""
+RECOMPUTE_POST_STATS_SQL = """
+WITH rates AS (
+    SELECT rate.post_id, {rate_aggregates}
+    FROM {rate_table} rate
+    WHERE rate.post_id >= %(start_id)s AND rate.post_id < %(end_id)s
+    GROUP BY rate.post_id
+),
+pending AS (
+    SELECT delta.key::bigint AS post_id, {pending_deltas}
+    FROM {batch_table} batch CROSS JOIN jsonb_each(batch.scores) delta
+    WHERE batch.stats_applied_at IS NULL
+      AND delta.key::bigint >= %(start_id)s AND delta.key::bigint < %(end_id)s
+    GROUP BY delta.key::bigint
+),
+totals AS (
+    SELECT stat.post_id, {totals}
+    FROM {stat_table} stat LEFT JOIN rates USING (post_id) LEFT JOIN pending USING (post_id)
+    WHERE stat.post_id >= %(start_id)s AND stat.post_id < %(end_id)s
+      AND (rates.post_id IS NOT NULL OR stat.total_rates <> 0)
+)
+UPDATE {stat_table} stat
+SET {assignments}, updated_at = now()
+FROM totals
+WHERE stat.post_id = totals.post_id
+RETURNING stat.post_id
+"""
+
+
+def _recompute_post_stats_sql() -> str:
+    return RECOMPUTE_POST_STATS_SQL.format(
+        rate_table=connection.ops.quote_name(Rate._meta.db_table),
+        batch_table=connection.ops.quote_name(AppliedRateBatch._meta.db_table),
+        stat_table=connection.ops.quote_name(PostStat._meta.db_table),
+        rate_aggregates=', '.join(f'{aggregate} AS {field}' for field, aggregate in RATE_AGGREGATES_SQL.items()),
+        pending_deltas=', '.join(
+            f"SUM((delta.value ->> '{delta_key}')::bigint) AS {field}"
+            for field, delta_key in POST_STAT_DELTA_FIELDS.items()
+        ),
+        totals=', '.join(
+            f'COALESCE(rates.{field}, 0) - COALESCE(pending.{field}, 0) AS {field}' for field in POST_STAT_DELTA_FIELDS
+        ),
+        assignments=', '.join(f'{field} = totals.{field}' for field in POST_STAT_DELTA_FIELDS),
     )
+
+
+def recompute_post_stats(*, start_id: int, end_id: int) -> list[PostStat]:
+    """
+    Recompute the stats of the rated posts with start_id <= id < end_id from their rates, in one transaction that
+    locks their PostStat rows first, so no rate batch increments them between the aggregate and the write.
+    Returns the stats written.
+    """
+    with transaction.atomic():
+        rated_post_ids = Rate.objects.filter(post_id__gte=start_id, post_id__lt=end_id).values_list(
+            'post_id', flat=True
+        ).distinct().order_by()
+        PostStat.objects.bulk_create([PostStat(post_id=post_id) for post_id in rated_post_ids], ignore_conflicts=True)
+        list(PostStat.objects.select_for_update().filter(
+            post_id__gte=start_id, post_id__lt=end_id
+        ).order_by('post_id').values_list('id', flat=True))
+
+        with connection.cursor() as cursor:
+            cursor.execute(_recompute_post_stats_sql(), {'start_id': start_id, 'end_id': end_id})
+            post_ids = [post_id for post_id, in cursor.fetchall()]
+
+        post_stats = PostStat.objects.filter(post_id__in=post_ids)
+        post_stats.update(
+            average_rates=PostStat.average_rates_expression(
+                suspected_rates_threshold=settings.SUSPECTED_RATES_THRESHOLD
+            )
+        )
+        return list(post_stats)
+
+
+def get_post_id_shards(*, shard_size: int) -> list[tuple[int, int]]:
+    """
+    Split the post id space into [start_id, end_id) ranges of shard_size ids, aligned to multiples of shard_size,
+    so a range always gets the same bounds (and shard lock) whatever the lowest and highest post ids are.
+    """
+    post_ids = Post.objects.aggregate(min_id=Min('id'), max_id=Max('id'))
+    if post_ids['min_id'] is None:
+        return []
+    return [
+        (start_id, start_id + shard_size)
+        for start_id in range(post_ids['min_id'] // shard_size * shard_size, post_ids['max_id'] + 1, shard_size)
+    ]
+
+
+def recompute_post_stats_range(*, start_id: int, end_id: int, chunk_size: int = None) -> dict:
+    """
+    Recompute the stats of the posts with start_id <= id < end_id, chunk by chunk, and report the throughput.
+    """
+    chunk_size = chunk_size or settings.STATS_RECOMPUTE_CHUNK_SIZE
+    started_at, rows = time.monotonic(), 0
+
+    for chunk_start_id in range(start_id, end_id, chunk_size):
+        post_stats = recompute_post_stats(start_id=chunk_start_id, end_id=min(chunk_start_id + chunk_size, end_id))
+        update_cache_post_stats(post_stats=post_stats)
+        rows += len(post_stats)
+
+    seconds = time.monotonic() - started_at
+    return {'rows': rows, 'seconds': seconds, 'rows_per_second': rows / seconds if seconds else 0}
@@ -1,56 +1,340 @@
-from django.core.cache import cache
+import logging
+from datetime import datetime, timezone
+from functools import partial
 
-from core.settings.third_parties.redis_templates import RedisKeyTemplates
-from posts.models import Rate
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, IntegrityError, transaction
+
+from accounts.services.queries import get_existing_user_ids
+from commons.fraud_detection import FraudDetection
+from commons.messages.log_messges import LogMessages
+from posts.buffers import PendingRateBuffer
+from posts.enums import BulkRateStatusEnum, RateIngestionBackendEnum
+from posts.models import PostStat, Rate
+from posts.services.commands.rate_batch import new_rate_batch_id, record_rate_batch
+from posts.services.queries.post import get_existing_post_ids
+from posts.services.queries.rate import get_rates_updated_since
+from posts.services.queries.rate_batch import get_applied_stream_entry_ids, is_rate_batch_applied
+from posts.streams import RateStream
 from posts.tasks import bulk_update_or_create_post_stats
 
-# TODO : it should be in settings env.int(BULK_THRESHOLD,50)
-BULK_THRESHOLD = 50
-CACHE_TIMEOUT = 15 * 60  # 15 minutes
+logger = logging.getLogger(__name__)
 
 
 def update_or_create_rate(*, user_id: int, post_id: int, score: int, is_suspected=False):
-    key = RedisKeyTemplates.pending_rates_key()
-    pending_rates = cache.get(key, [])
-    pending_rates.append({'user_id': user_id, 'post_id': post_id, 'score': score, 'is_suspected': is_suspected})
+    rate = {'user_id': user_id, 'post_id': post_id, 'score': score, 'is_suspected': is_suspected}
     """
     There are some situation that system will shutdown so we should enable redis to store in file system
     Update: persist=True -> AOF (Append Only File) or RDB (Redis Database Backup)
     """
-    cache.set(key, pending_rates, timeout=CACHE_TIMEOUT)
+    if settings.RATE_INGESTION_BACKEND == RateIngestionBackendEnum.STREAM:
+        """the stream consumers apply it, no database write in the request"""
+        RateStream.add(rate)
+        return
 
-    if len(pending_rates) >= BULK_THRESHOLD:
-        bulk_update_or_create_rates(pending_rates)
-        cache.delete(key)
+    buffer_size = PendingRateBuffer.push(rate)
 
+    if buffer_size >= settings.BULK_THRESHOLD:
+        """Only the caller that pops the batch applies it, concurrent callers get the next one or nothing"""
+        flush_pending_rates(settings.BULK_THRESHOLD)
 
-def bulk_update_or_create_rates(rate_data: list[dict]):
-    existing_rates = Rate.objects.filter(
-        user_id__in=[rate['user_id'] for rate in rate_data],
-        post_id__in=[rate['post_id'] for rate in rate_data]
-    )
 
-    rate_lookup = {(rate.user_id, rate.post_id): rate for rate in existing_rates}
-    new_scores = {rate["post_id"]: {"score": 0, "count": 0, "is_suspected": rate["is_suspected"]} for rate in rate_data}
-    new_rates, updated_rates = [], []
-
-    for rate in rate_data:
-        user_id, post_id, score, is_suspected = rate['user_id'], rate['post_id'], rate['score'], rate['is_suspected']
-        if (user_id, post_id) in rate_lookup:
-            existing_rate = rate_lookup[(user_id, post_id)]
-            new_scores[post_id]["score"] += score - existing_rate.score
-            existing_rate.score, existing_rate.is_suspected = score, is_suspected
-            updated_rates.append(existing_rate)
+async def aupdate_or_create_rate(*, user_id: int, post_id: int, score: int, is_suspected=False):
+    """
+    update_or_create_rate for the async views, the buffer and the stream are written with the async redis client.
+    The caller that pops a full batch applies it on a worker thread, like the sync path does in its request.
+    """
+    rate = {'user_id': user_id, 'post_id': post_id, 'score': score, 'is_suspected': is_suspected}
+    if settings.RATE_INGESTION_BACKEND == RateIngestionBackendEnum.STREAM:
+        await RateStream.aadd(rate)
+        return
+
+    if await PendingRateBuffer.apush(rate) >= settings.BULK_THRESHOLD:
+        await aflush_pending_rates(settings.BULK_THRESHOLD)
+
+
+def update_or_create_rates(*, rates: list[dict]):
+    """update_or_create_rate for many rates, pushed with one buffer (or stream) operation"""
+    if settings.RATE_INGESTION_BACKEND == RateIngestionBackendEnum.STREAM:
+        RateStream.add_many(rates)
+        return
+
+    buffer_size = PendingRateBuffer.push_many(rates)
+
+    if buffer_size >= settings.BULK_THRESHOLD:
+        flush_pending_rates(max(settings.BULK_THRESHOLD, len(rates)))
+
+
+def submit_bulk_rates(*, user_id: int, items: list[dict]) -> list[dict]:
+    """
+    Validate the posts of a bulk submission with one IN query, check fraud for all of them in one pipeline
+    and push them with one operation. Returns the items with their status, in the submitted order.
+    A post rated twice in the submission keeps its last score, the earlier ones are duplicates.
+    """
+    existing_post_ids = get_existing_post_ids(post_ids={item['post_id'] for item in items})
+    last_index = {item['post_id']: index for index, item in enumerate(items)}
+    accepted = [
+        item for index, item in enumerate(items)
+        if item['post_id'] in existing_post_ids and last_index[item['post_id']] == index
+    ]
+
+    suspicious = FraudDetection.detect_suspicious_activities([item['post_id'] for item in accepted])
+    rates = [
+        {'user_id': user_id, 'post_id': item['post_id'], 'score': item['score'], 'is_suspected': is_suspected}
+        for item, is_suspected in zip(accepted, suspicious)
+    ]
+    if rates:
+        update_or_create_rates(rates=rates)
+
+    is_suspected = {rate['post_id']: rate['is_suspected'] for rate in rates}
+    results = []
+    for index, item in enumerate(items):
+        if item['post_id'] not in existing_post_ids:
+            status = BulkRateStatusEnum.POST_NOT_FOUND
+        elif last_index[item['post_id']] != index:
+            status = BulkRateStatusEnum.DUPLICATE
         else:
-            new_scores[post_id]["score"] += score
-            new_scores[post_id]["count"] += 1
-            new_rates.append(Rate(user_id=user_id, post_id=post_id, score=score, is_suspected=is_suspected))
+            status = BulkRateStatusEnum.ACCEPTED
+        results.append({**item, 'status': status, 'is_suspected': is_suspected.get(item['post_id'], False)})
+    return results
 
-    if updated_rates:
-        Rate.objects.bulk_update(updated_rates, ['score', 'is_suspected'])
 
-    if new_rates:
-        Rate.objects.bulk_create(new_rates, ignore_conflicts=True)
+def flush_pending_rates(size: int) -> int:
+    """Pop up to `size` pairs of the pending rate buffer as a new batch and apply it, returns the number of rates."""
+    batch_id = new_rate_batch_id('buffer')
+    if rate_data := PendingRateBuffer.pop_batch(size, batch_id=batch_id):
+        apply_buffered_rates(rate_data, batch_id=batch_id)
+    return len(rate_data)
+
+
+async def aflush_pending_rates(size: int) -> int:
+    batch_id = new_rate_batch_id('buffer')
+    if rate_data := await PendingRateBuffer.apop_batch(size, batch_id=batch_id):
+        await sync_to_async(apply_buffered_rates)(rate_data, batch_id=batch_id)
+    return len(rate_data)
+
+
+def apply_buffered_rates(rate_data: list[dict], *, batch_id: str):
+    """
+    Apply a batch popped from the pending rate buffer and forget it once it is committed.
+    A failed batch, or the batch of a worker that died, stays in its processing hash and is replayed under the same
+    batch id by `replay_buffered_rate_batches`, so the ledger applies it once whether or not it was committed.
+    """
+    bulk_update_or_create_rates(rate_data, batch_id=batch_id)
+    PendingRateBuffer.complete(batch_id)
+
+
+def replay_buffered_rate_batches(*, older_than: float) -> int:
+    """
+    Apply again the buffer batches popped at least `older_than` seconds ago and never completed, returns their number.
+    A pair rated again and written by a newer batch since the batch was popped keeps its newer rate.
+    """
+    batch_ids = PendingRateBuffer.get_processing_batch_ids(older_than=older_than)
+    for batch_id in batch_ids:
+        rate_data, popped_at = PendingRateBuffer.get_processing_batch(batch_id)
+        if popped_at is None or is_rate_batch_applied(batch_id=batch_id):
+            """completed meanwhile, or committed by a worker that died before completing it"""
+            PendingRateBuffer.complete(batch_id)
+            continue
+        superseded = get_rates_updated_since(
+            rate_data=rate_data, since=datetime.fromtimestamp(popped_at, tz=timezone.utc)
+        )
+        try:
+            apply_buffered_rates(
+                [rate for rate in rate_data if (rate['post_id'], rate['user_id']) not in superseded],
+                batch_id=batch_id,
+            )
+        except Exception as e:
+            logger.exception(LogMessages.replay_rate_batch_error(batch_id=batch_id, error=e))
+    return len(batch_ids)
+
+
+def consume_rate_stream(*, consumer: str, batch_size: int, block_ms: int = None) -> int:
+    """
+    Apply one batch of new stream entries and ack it, returns the number of applied rates.
+    A failing batch is not acked, it stays pending and is re-applied by `reclaim_rate_stream`.
+    """
+    if entries := RateStream.read_batch(consumer=consumer, count=batch_size, block_ms=block_ms):
+        _apply_stream_entries(entries)
+    return len(entries)
+
+
+def reclaim_rate_stream(*, consumer: str, batch_size: int) -> int:
+    """Re-apply the entries left pending by crashed consumers or failed batches, returns the number of applied rates."""
+    applied = 0
+    for entries in RateStream.reclaim(
+        consumer=consumer, min_idle_ms=settings.RATE_STREAM_RECLAIM_IDLE_MS, count=batch_size
+    ):
+        _apply_stream_entries(entries)
+        applied += len(entries)
+    return applied
+
+
+def _apply_stream_entries(entries: list[tuple[str, dict]]):
+    """
+    Apply the entries no batch of the ledger applied yet, then ack all of them. The ledger records every entry,
+    so an entry read again in a batch cut differently (another batch size, a reclaim) is not applied twice.
+    """
+    entry_ids = [entry_id for entry_id, _ in entries]
+    applied_entry_ids = get_applied_stream_entry_ids(entry_ids=entry_ids)
+    if pending := [(entry_id, rate) for entry_id, rate in entries if entry_id not in applied_entry_ids]:
+        bulk_update_or_create_rates(
+            [rate for _, rate in pending],
+            batch_id=new_rate_batch_id('stream'),
+            stream_entry_ids=[entry_id for entry_id, _ in pending],
+        )
+    RateStream.ack(entry_ids)
+
+
+"""
+Upsert of a chunk of distinct (post, user) rates in one statement, returning the previous value of every row.
+`previous` locks the existing rows, so a concurrent update of one of them waits and the returned previous value is the
+one that was overwritten, `updated` rewrites them and `inserted` adds the other pairs.
+A pair inserted concurrently after the statement started is skipped by ON CONFLICT DO NOTHING instead of being
+overwritten without its previous value, it is missing from the result and the caller writes it again.
+Only plain columns are returned, the statement works on the hash partitioned rate table too.
+"""
+UPSERT_RATES_SQL = """
+WITH batch (post_id, user_id, score, is_suspected) AS (VALUES {values}),
+previous AS MATERIALIZED (
+    SELECT rate.post_id, rate.user_id, rate.score, rate.is_suspected
+    FROM {table} rate JOIN batch USING (post_id, user_id)
+    ORDER BY rate.post_id, rate.user_id
+    FOR UPDATE OF rate
+),
+updated AS (
+    UPDATE {table} rate
+    SET score = batch.score, is_suspected = batch.is_suspected, updated_at = now()
+    FROM previous JOIN batch USING (post_id, user_id)
+    WHERE rate.post_id = previous.post_id AND rate.user_id = previous.user_id
+    RETURNING rate.post_id, rate.user_id, rate.score, rate.is_suspected
+),
+inserted AS (
+    INSERT INTO {table} (post_id, user_id, score, is_suspected, created_at, updated_at)
+    SELECT batch.post_id, batch.user_id, batch.score, batch.is_suspected, now(), now()
+    FROM batch LEFT JOIN previous USING (post_id, user_id)
+    WHERE previous.post_id IS NULL
+    ORDER BY batch.post_id, batch.user_id
+    ON CONFLICT (post_id, user_id) DO NOTHING
+    RETURNING post_id, user_id, score, is_suspected
+)
+SELECT updated.post_id, updated.user_id, updated.score, updated.is_suspected,
+       true AS existed, previous.score, previous.is_suspected
+FROM updated JOIN previous USING (post_id, user_id)
+UNION ALL
+SELECT post_id, user_id, score, is_suspected, false, NULL, NULL
+FROM inserted
+"""
+
+
+def _empty_scores() -> dict:
+    return {
+        "score": 0, "count": 0, "suspected_score": 0, "suspected_count": 0,
+        **{field: 0 for field in PostStat.histogram_fields()}
+    }
+
+
+def _add_rate_to_scores(scores: dict, *, score: int | None, is_suspected: bool, sign: int = 1):
+    """add (sign=1) or take out (sign=-1) one rate of the sums of its post"""
+    scores["score"] += sign * (score or 0)
+    scores["count"] += sign
+    if score is not None:
+        scores[PostStat.histogram_field(score)] += sign
+    if is_suspected:
+        scores["suspected_score"] += sign * (score or 0)
+        scores["suspected_count"] += sign
+
+
+def _upsert_rates_chunk(rates: list[dict]) -> tuple[list[tuple], list[dict]]:
+    """
+    Run UPSERT_RATES_SQL on distinct (post, user) rates,
+    returns its rows and the rates skipped because their pair was inserted concurrently.
+    """
+    sql = UPSERT_RATES_SQL.format(
+        values=', '.join(['(%s::bigint, %s::bigint, %s::integer, %s::boolean)'] * len(rates)),
+        table=connection.ops.quote_name(Rate._meta.db_table),
+    )
+    params = [
+        value for rate in rates for value in (rate['post_id'], rate['user_id'], rate['score'], rate['is_suspected'])
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    written = {(post_id, user_id) for post_id, user_id, *_ in rows}
+    return rows, [rate for rate in rates if (rate['post_id'], rate['user_id']) not in written]
+
+
+def upsert_rates(rate_data: list[dict]) -> dict[int, dict]:
+    """
+    Write a batch of rates with one UPDATE and INSERT ... ON CONFLICT statement per chunk and return the exact per post
+    deltas of the stats, from the previous and the new value of every row. A (post, user) repeated in the batch keeps
+    its last rate, as if the rates were applied one by one.
+    PostgreSQL only, no other backend returns the overwritten values of an upsert, so the deltas could not be exact.
+    """
+    if connection.vendor != 'postgresql':
+        raise ImproperlyConfigured(f'Rate batches are written with a PostgreSQL upsert, not on {connection.vendor}')
+    rates = list({(rate['post_id'], rate['user_id']): rate for rate in rate_data}.values())
+    new_scores = {rate['post_id']: _empty_scores() for rate in rates}
+
+    with transaction.atomic():
+        for start in range(0, len(rates), settings.RATE_UPSERT_CHUNK_SIZE):
+            chunk = rates[start:start + settings.RATE_UPSERT_CHUNK_SIZE]
+            """the skipped pairs were inserted and committed by another batch, the next statement locks them"""
+            while chunk:
+                rows, chunk = _upsert_rates_chunk(chunk)
+                for post_id, _, score, is_suspected, existed, previous_score, previous_is_suspected in rows:
+                    if existed:
+                        _add_rate_to_scores(
+                            new_scores[post_id], score=previous_score, is_suspected=previous_is_suspected, sign=-1
+                        )
+                    _add_rate_to_scores(new_scores[post_id], score=score, is_suspected=is_suspected)
+    return new_scores
+
+
+def drop_orphan_rates(rate_data: list[dict], *, batch_id: str) -> list[dict]:
+    """
+    Drop the rates whose post or user was deleted since they were submitted. Their foreign keys would fail the whole
+    batch, on every delivery of it (a replayed buffer batch, a reclaimed stream entry), so they are logged and skipped.
+    """
+    existing_post_ids = get_existing_post_ids(post_ids={rate['post_id'] for rate in rate_data})
+    existing_user_ids = get_existing_user_ids(user_ids={rate['user_id'] for rate in rate_data})
+    rates = [
+        rate for rate in rate_data if rate['post_id'] in existing_post_ids and rate['user_id'] in existing_user_ids
+    ]
+    if dropped := len(rate_data) - len(rates):
+        logger.warning(LogMessages.drop_orphan_rates(batch_id=batch_id, dropped=dropped))
+    return rates
+
+
+def bulk_update_or_create_rates(rate_data: list[dict], *, batch_id: str, stream_entry_ids: list[str] = ()):
+    """
+    Write a batch of rates and record it in the ledger with its stats deltas in one transaction, the deltas are applied
+    by a task once it commits. A batch already in the ledger is skipped, so a batch delivered twice is applied once.
+    The rate stream entries of the batch are recorded with it, see `_apply_stream_entries`, with its orphan rates too.
+    """
+    if is_rate_batch_applied(batch_id=batch_id):
+        logger.info(LogMessages.skip_rate_batch(batch_id=batch_id))
+        return
 
-    if new_scores:
-        bulk_update_or_create_post_stats.delay(scores=new_scores)
+    try:
+        with transaction.atomic():
+            rate_data = drop_orphan_rates(rate_data, batch_id=batch_id)
+            new_scores = upsert_rates(rate_data)
+            record_rate_batch(
+                batch_id=batch_id, rates=len(rate_data), scores=new_scores, stream_entry_ids=stream_entry_ids
+            )
+            """a lost task is enqueued again by `resume_rate_batches`"""
+            transaction.on_commit(partial(bulk_update_or_create_post_stats.delay, batch_id=batch_id), robust=True)
+    except IntegrityError:
+        """
+        the same batch, or all of its stream entries, were recorded concurrently, its rates were rolled back here.
+        With only some of its entries recorded it fails and stays pending, its other entries are applied on reclaim.
+        """
+        if not is_rate_batch_applied(batch_id=batch_id) and not (
+            stream_entry_ids
+            and len(get_applied_stream_entry_ids(entry_ids=stream_entry_ids)) == len(stream_entry_ids)
+        ):
+            raise
+        logger.info(LogMessages.skip_rate_batch(batch_id=batch_id))
@@ -0,0 +1,52 @@
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from posts.models import AppliedRateBatch, AppliedRateStreamEntry, PostStat
+from posts.services.commands.post_stat import increment_post_stats
+
+
+def new_rate_batch_id(prefix: str) -> str:
+    return f"{prefix}:{uuid.uuid4().hex}"
+
+
+def record_rate_batch(*, batch_id: str, rates: int, scores: dict[int, dict], stream_entry_ids: list[str] = ()):
+    """
+    Add the batch, and the stream entries it applies, to the ledger in the transaction of its rates.
+    A concurrent delivery of the same batch, or of one of its entries, waits on the unique batch_id (entry_id)
+    and then fails with an IntegrityError, which rolls its rates back.
+    """
+    batch = AppliedRateBatch.objects.create(batch_id=batch_id, rates=rates, scores=scores)
+    AppliedRateStreamEntry.objects.bulk_create(
+        [AppliedRateStreamEntry(entry_id=entry_id, batch=batch) for entry_id in stream_entry_ids]
+    )
+
+
+def apply_rate_batch_stats(*, batch_id: str) -> list[PostStat] | None:
+    """
+    Add the stats deltas of a batch to the post stats and mark them applied, in one transaction.
+    Returns None when they were already applied (or the batch is unknown), so a redelivered task is a no-op.
+    """
+    with transaction.atomic():
+        batch = AppliedRateBatch.objects.select_for_update().filter(
+            batch_id=batch_id, stats_applied_at__isnull=True
+        ).first()
+        if batch is None:
+            return None
+        post_stats = increment_post_stats(scores={int(post_id): delta for post_id, delta in batch.scores.items()})
+        batch.stats_applied_at = timezone.now()
+        batch.save(update_fields=['stats_applied_at', 'updated_at'])
+    return post_stats
+
+
+def prune_rate_batches(*, older_than: float) -> int:
+    """
+    Drop the ledger rows of batches applied more than `older_than` seconds ago, a delivery of one of them after that
+    would be applied again, so it must be longer than any redelivery delay (celery visibility timeout, stream reclaim).
+    """
+    deleted, _ = AppliedRateBatch.objects.filter(
+        stats_applied_at__isnull=False, created_at__lt=timezone.now() - timedelta(seconds=older_than)
+    ).delete()
+    return deleted
@@ -0,0 +1,84 @@
+import time
+
+from django.db import connection, transaction
+
+from posts.models import Rate
+from posts.services.queries.rate import get_rate_table_partitions
+
+"""
+The primary key of a partitioned table must contain its partition key, `id` alone is only unique through its sequence.
+"""
+PARTITIONED_PRIMARY_KEY = 'PRIMARY KEY (id, post_id)'
+
+
+def _get_constraints(cursor, table: str) -> list[tuple[str, str, str]]:
+    cursor.execute(
+        "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass",
+        [table],
+    )
+    return cursor.fetchall()
+
+
+def _get_plain_indexes(cursor, table: str) -> list[str]:
+    """definitions of the indexes that do not back a constraint"""
+    cursor.execute(
+        "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s AND indexname NOT IN "
+        "(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)",
+        [table, table],
+    )
+    return [indexdef for indexdef, in cursor.fetchall()]
+
+
+def partition_rate_table(*, partitions: int) -> dict:
+    """
+    Convert the rate table to a table hash partitioned on post_id, in one transaction that holds an exclusive lock
+    on it: the rates are copied into `partitions` partitions, then the constraints and indexes are created again under
+    their names (so later migrations still find them), except the primary key that becomes (id, post_id).
+    Every query filtering on one post_id, and every row of the bulk upsert, then reaches a single partition.
+    """
+    table = Rate._meta.db_table
+    partitioned_table = f"{table}_partitioned"
+    quote = connection.ops.quote_name
+    started_at = time.monotonic()
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {quote(table)} IN ACCESS EXCLUSIVE MODE")
+        """the deferred foreign key checks of rates written earlier in the transaction would keep the table in use"""
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        if (current_partitions := get_rate_table_partitions()) is not None:
+            raise ValueError(f"{table} is already partitioned in {current_partitions} partitions")
+        constraints, indexes = _get_constraints(cursor, table), _get_plain_indexes(cursor, table)
+        for name, constraint_type, definition in constraints:
+            if constraint_type == 'u' and 'post_id' not in definition:
+                raise ValueError(f"{name} ({definition}) does not contain post_id, it can not be kept when partitioned")
+
+        cursor.execute(
+            f"CREATE TABLE {quote(partitioned_table)} (LIKE {quote(table)} INCLUDING DEFAULTS) "
+            f"PARTITION BY HASH (post_id)"
+        )
+        for remainder in range(partitions):
+            cursor.execute(
+                f"CREATE TABLE {quote(f'{table}_p{remainder}')} PARTITION OF {quote(partitioned_table)} "
+                f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+            )
+        """the indexes are built once the rows are copied, faster than maintaining them row by row"""
+        cursor.execute(f"INSERT INTO {quote(partitioned_table)} SELECT * FROM {quote(table)}")
+        rows = cursor.rowcount
+        cursor.execute(f"DROP TABLE {quote(table)}")
+        cursor.execute(f"ALTER TABLE {quote(partitioned_table)} RENAME TO {quote(table)}")
+
+        """partitioned tables take no identity column, the ids go on from a sequence owned by the column"""
+        sequence = f"{table}_id_seq"
+        cursor.execute(f"CREATE SEQUENCE {quote(sequence)} OWNED BY {quote(table)}.id")
+        cursor.execute(f"SELECT setval(%s, COALESCE(MAX(id), 0) + 1, false) FROM {quote(table)}", [sequence])
+        cursor.execute(f"ALTER TABLE {quote(table)} ALTER COLUMN id SET DEFAULT nextval(%s)", [sequence])
+
+        for name, constraint_type, definition in constraints:
+            if constraint_type == 'p':
+                definition = PARTITIONED_PRIMARY_KEY
+            cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}")
+        for indexdef in indexes:
+            cursor.execute(indexdef)
+        cursor.execute(f"ANALYZE {quote(table)}")
+
+    return {'rows': rows, 'partitions': partitions, 'seconds': time.monotonic() - started_at}
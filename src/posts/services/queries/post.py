@@ -0,0 +1,5 @@
+from posts.models import Post
+
+
+def get_existing_post_ids(*, post_ids: set[int]) -> set[int]:
+    return set(Post.objects.filter(id__in=post_ids).values_list('id', flat=True))
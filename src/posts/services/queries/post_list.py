@@ -0,0 +1,43 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.settings.third_parties.cache import get_redis_client
+from core.settings.third_parties.redis_templates import RedisKeyTemplates
+
+redis_client = get_redis_client()
+
+
+def get_post_stats_version() -> tuple[int, int]:
+    """
+    The global stats version and the time it was last bumped at, in one round-trip.
+    The first reader initializes them, so Last-Modified is known before the first bump.
+    """
+    key = RedisKeyTemplates.post_stats_version_key()
+    pipeline = redis_client.pipeline(transaction=False)
+    pipeline.hsetnx(key, 'version', 0)
+    pipeline.hsetnx(key, 'modified_at', int(time.time()))
+    pipeline.hmget(key, 'version', 'modified_at')
+    version, modified_at = pipeline.execute()[-1]
+    return int(version), int(modified_at)
+
+
+def get_post_list_page_key(*, version: int, url: str) -> str:
+    query_hash = hashlib.sha1(url.encode()).hexdigest()
+    return RedisKeyTemplates.format_post_list_page_key(version=version, query_hash=query_hash)
+
+
+def get_post_list_etag(page_key: str) -> str:
+    """The page is a function of the url and the stats version, both are in its key"""
+    return hashlib.sha1(page_key.encode()).hexdigest()
+
+
+def get_cached_post_list_page(page_key: str) -> dict | None:
+    return cache.get(page_key) if settings.POST_LIST_CACHE_TTL else None
+
+
+def set_cached_post_list_page(page_key: str, data: dict):
+    if settings.POST_LIST_CACHE_TTL:
+        cache.set(page_key, data, timeout=settings.POST_LIST_CACHE_TTL)
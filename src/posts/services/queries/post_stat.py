@@ -1,23 +1,260 @@
+import random
+import time
+import uuid
+from math import ceil, log
+
 from django.conf import settings
 from django.core.cache import cache
 
+from commons.local_cache import CacheStats, LocalLRUCache
+from core.settings.third_parties.cache import get_redis_client
 from core.settings.third_parties.redis_templates import RedisKeyTemplates
+from posts.enums import RateScoreEnum
 from posts.models.post_stat import PostStat
 
+DISTRIBUTION_PERCENTILES = (25, 50, 75, 90, 99)
+POST_STATS_LOCK_POLL_INTERVAL = 0.02
+
+redis_client = get_redis_client()
+
+"""
+Delete the locks still holding the token of their caller, KEYS: locks, ARGV[1]: token.
+A lock that expired and was taken by another caller is left to that caller.
+"""
+RELEASE_LOCKS_SCRIPT = """
+local released = 0
+for i = 1, #KEYS do
+    if redis.call('GET', KEYS[i]) == ARGV[1] then
+        released = released + redis.call('DEL', KEYS[i])
+    end
+end
+return released
+"""
+release_locks = redis_client.register_script(RELEASE_LOCKS_SCRIPT)
+
+"""post id -> cache entry of its stats, invalidated on every change by update_cache_post_stats"""
+local_post_stats = LocalLRUCache(
+    name='post_stats',
+    max_size=settings.POST_STATS_LOCAL_CACHE_SIZE,
+    ttl=settings.POST_STATS_LOCAL_CACHE_TTL,
+    channel=RedisKeyTemplates.post_stats_invalidate_channel(),
+    redis_client=redis_client,
+)
+redis_post_stats = CacheStats('post_stats:redis')
+"""hits of negative entries (posts without stats) in either tier, also counted in the hits of that tier"""
+negative_post_stats = CacheStats('post_stats:negative')
+
+
+def get_empty_post_stat() -> dict:
+    return {'average_rates': 0, 'total_rates': 0, 'distribution': [0] * len(RateScoreEnum.values)}
+
+
+def get_post_stat_cache_entry(post_stat: PostStat) -> dict:
+    return {
+        'average_rates': post_stat.average_rates,
+        'total_rates': post_stat.total_rates,
+        'distribution': post_stat.distribution,
+    }
+
+
+def wrap_post_stat_cache_entry(entry: dict | None, *, delta: float, expires_at: float) -> dict:
+    """
+    The cached stats with the time they logically expire at and the seconds it took to compute them (delta),
+    the redis key itself outlives `expires_at` by POST_STATS_STALE_TTL so a stale value can be served meanwhile.
+    A None entry is a negative one, the post has no PostStat row.
+    """
+    return {'value': entry, 'expires_at': expires_at, 'delta': delta}
+
+
+def set_cached_post_stats(stats: dict[int, dict | None], *, delta: float = 0, ttl: int = None):
+    ttl = ttl or settings.CACHE_TIMEOUT
+    expires_at = time.time() + ttl
+    cache.set_many(
+        {
+            RedisKeyTemplates.format_post_stats_key(post_id=post_id): wrap_post_stat_cache_entry(
+                entry, delta=delta, expires_at=expires_at
+            )
+            for post_id, entry in stats.items()
+        },
+        timeout=ttl + settings.POST_STATS_STALE_TTL
+    )
+
+
+def should_refresh_post_stat(cached: dict, now: float) -> bool:
+    """
+    Probabilistic early expiration (XFetch): the closer to `expires_at` and the slower the recompute,
+    the more likely a reader refreshes the entry before it expires.
+    """
+    early = cached['delta'] * settings.POST_STATS_EARLY_REFRESH_BETA * -log(1 - random.random())
+    return now + early >= cached['expires_at']
+
+
+def acquire_post_stat_locks(post_ids: list[int]) -> tuple[str, list[int]]:
+    """
+    Single flight: SET NX of the lock of every post in one pipeline, to a token of this caller.
+    Returns the token and the posts this caller refreshes.
+    """
+    token = uuid.uuid4().hex
+    pipeline = redis_client.pipeline(transaction=False)
+    for post_id in post_ids:
+        pipeline.set(
+            RedisKeyTemplates.format_post_stats_lock_key(post_id=post_id), token,
+            nx=True, px=int(settings.POST_STATS_LOCK_TIMEOUT * 1000)
+        )
+    return token, [post_id for post_id, acquired in zip(post_ids, pipeline.execute()) if acquired]
+
+
+def release_post_stat_locks(post_ids: list[int], token: str):
+    """Release the locks of the posts still held with `token`, in one script call"""
+    if post_ids:
+        release_locks(
+            keys=[RedisKeyTemplates.format_post_stats_lock_key(post_id=post_id) for post_id in post_ids],
+            args=[token],
+        )
+
+
+def acquire_post_stats_shard_lock(*, start_id: int, end_id: int) -> str | None:
+    """SET NX of the lock of a recompute shard to a token of this caller, returns the token or None when it is held"""
+    token = uuid.uuid4().hex
+    if redis_client.set(
+        RedisKeyTemplates.format_post_stats_shard_lock_key(start_id=start_id, end_id=end_id), token,
+        nx=True, ex=settings.STATS_RECOMPUTE_LOCK_TIMEOUT
+    ):
+        return token
+    return None
+
+
+def release_post_stats_shard_lock(*, start_id: int, end_id: int, token: str):
+    """Release the lock of a recompute shard if it is still held with `token`, a run that outlived it leaves it be"""
+    release_locks(
+        keys=[RedisKeyTemplates.format_post_stats_shard_lock_key(start_id=start_id, end_id=end_id)], args=[token]
+    )
 
-def get_post_stat(*, post_id: int):
-    key = RedisKeyTemplates.format_post_stats_key(post_id=post_id)
-    stats = cache.get(key)
-    if stats:
-        return stats
-
-    if post_stat := PostStat.objects.filter(post_id=post_id).first():
-        stats = {
-            'average_rates': post_stat.average_rates,
-            'total_rates': post_stat.total_rates
-        }
-        cache.set(key, stats, timeout=settings.CACHE_TIMEOUT)
-    else:
-        stats = {'average_rates': 0, 'total_rates': 0}
 
+def load_post_stats(post_ids: list[int]) -> dict[int, dict | None]:
+    """
+    One PostStat IN query for the posts, written back to redis with one pipelined SET.
+    Posts without a row get a negative (None) entry for POST_STATS_NEGATIVE_TTL only, the first rate batch
+    of the post overwrites it through update_cache_post_stats.
+    """
+    started_at = time.monotonic()
+    stats = {
+        post_stat.post_id: get_post_stat_cache_entry(post_stat)
+        for post_stat in PostStat.objects.filter(post_id__in=post_ids)
+    }
+    delta = time.monotonic() - started_at
+    set_cached_post_stats(stats, delta=delta)
+
+    if unrated_post_ids := [post_id for post_id in post_ids if post_id not in stats]:
+        negative_stats = dict.fromkeys(unrated_post_ids)
+        set_cached_post_stats(negative_stats, delta=delta, ttl=settings.POST_STATS_NEGATIVE_TTL)
+        negative_post_stats.incr('stores', len(unrated_post_ids))
+        stats.update(negative_stats)
+    return stats
+
+
+def get_redis_post_stats(post_ids: list[int]) -> tuple[dict[int, dict], dict[int, dict]]:
+    """One MGET of the posts, split into fresh entries and entries due (or early) for a refresh"""
+    keys = {RedisKeyTemplates.format_post_stats_key(post_id=post_id): post_id for post_id in post_ids}
+    fresh, stale, now = {}, {}, time.time()
+    for key, cached in cache.get_many(keys).items():
+        if not isinstance(cached, dict) or 'expires_at' not in cached:
+            continue
+        if should_refresh_post_stat(cached, now):
+            stale[keys[key]] = cached['value']
+        else:
+            fresh[keys[key]] = cached['value']
+    return fresh, stale
+
+
+def wait_for_post_stats(post_ids: list[int]) -> dict[int, dict]:
+    """Poll redis while another caller holds the locks, up to POST_STATS_LOCK_WAIT seconds"""
+    stats, deadline = {}, time.monotonic() + settings.POST_STATS_LOCK_WAIT
+    while post_ids and time.monotonic() < deadline:
+        time.sleep(POST_STATS_LOCK_POLL_INTERVAL)
+        fresh, stale = get_redis_post_stats(post_ids)
+        stats.update(fresh)
+        stats.update(stale)
+        post_ids = [post_id for post_id in post_ids if post_id not in stats]
     return stats
+
+
+def get_post_stats(*, post_ids: list[int]) -> dict[int, dict]:
+    """
+    Resolve the stats of many posts from the in-process cache, then with one MGET for its misses.
+    Entries missing or due for a refresh are recomputed by a single caller per post, holding its POST_STATS_LOCK,
+    with one PostStat IN query. The other callers serve the stale value, or wait for the refresh when there is none,
+    and query PostStat themselves only when it does not land in time.
+    """
+    stats = local_post_stats.get_many(post_ids)
+    negative_post_stats.incr('hits', sum(entry is None for entry in stats.values()))
+
+    if redis_post_ids := [post_id for post_id in post_ids if post_id not in stats]:
+        fresh, stale = get_redis_post_stats(redis_post_ids)
+        redis_post_stats.incr('hits', len(fresh))
+        negative_post_stats.incr('hits', sum(entry is None for entry in fresh.values()))
+        redis_post_stats.incr('stale', len(stale))
+        redis_post_stats.incr('misses', len(redis_post_ids) - len(fresh) - len(stale))
+        local_post_stats.set_many(fresh)
+        stats.update(fresh)
+
+        if refresh_post_ids := [post_id for post_id in redis_post_ids if post_id not in fresh]:
+            lock_token, locked_post_ids = acquire_post_stat_locks(refresh_post_ids)
+            try:
+                refreshed = load_post_stats(locked_post_ids) if locked_post_ids else {}
+            finally:
+                release_post_stat_locks(locked_post_ids, lock_token)
+            local_post_stats.set_many(refreshed)
+            stats.update(refreshed)
+
+            waiting_post_ids = [post_id for post_id in refresh_post_ids if post_id not in locked_post_ids]
+            stats.update({post_id: stale[post_id] for post_id in waiting_post_ids if post_id in stale})
+            if waiting_post_ids := [post_id for post_id in waiting_post_ids if post_id not in stale]:
+                stats.update(wait_for_post_stats(waiting_post_ids))
+                if missing_post_ids := [post_id for post_id in waiting_post_ids if post_id not in stats]:
+                    stats.update(load_post_stats(missing_post_ids))
+
+    return {post_id: stats.get(post_id) or get_empty_post_stat() for post_id in post_ids}
+
+
+def get_joined_post_stats(*, posts: list) -> dict[int, dict]:
+    """Stats of posts fetched with select_related('stat'), read from the joined rows without any query"""
+    return {
+        post.id: get_post_stat_cache_entry(post.stat) if hasattr(post, 'stat') else get_empty_post_stat()
+        for post in posts
+    }
+
+
+def get_post_stat(*, post_id: int):
+    return get_post_stats(post_ids=[post_id])[post_id]
+
+
+def get_distribution_percentile(distribution: list[int], percentile: float) -> int | None:
+    """Nearest-rank percentile of the scores, walking the six counters of the histogram"""
+    if not (total_rates := sum(distribution)):
+        return None
+
+    rank, cumulative = max(ceil(percentile / 100 * total_rates), 1), 0
+    for score, rates in enumerate(distribution):
+        cumulative += rates
+        if cumulative >= rank:
+            return score
+
+
+def get_post_distribution(*, post_id: int) -> dict:
+    """
+    Rating distribution of a post answered from its histogram, the Rate table is never touched.
+    """
+    stats = get_post_stat(post_id=post_id)
+    distribution = stats.get('distribution') or get_empty_post_stat()['distribution']
+    return {
+        'post_id': post_id,
+        'average_rates': stats['average_rates'],
+        'total_rates': stats['total_rates'],
+        'distribution': dict(zip(RateScoreEnum.values, distribution)),
+        'median': get_distribution_percentile(distribution, 50),
+        'percentiles': {
+            percentile: get_distribution_percentile(distribution, percentile)
+            for percentile in DISTRIBUTION_PERCENTILES
+        },
+    }
@@ -1,30 +1,28 @@
-from django.db.models import Avg, Q
-from django.db.models.functions import Coalesce, Round
-
-from posts.models import Rate
+from datetime import datetime
 
+from django.db import connection
 
-def get_updated_rates(post, last_update):
-    """Filter rates that created or updated after last_update of post_stats"""
-    return Rate.objects.filter(post_id=post.id).filter(
-        Q(created_at__gt=last_update) | Q(updated_at__gt=last_update)
-    )
+from posts.models import Rate
 
 
-def calculate_average_rates(post, suspected_rates_threshold):
-    total_rates = Rate.objects.filter(post_id=post.id).count()
-    suspected_rates_count = Rate.objects.filter(post_id=post.id, is_suspected=True).count()
+def get_rate_table_partitions() -> int | None:
+    """Number of partitions of the rate table, None when it is a plain table"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind = 'p', (SELECT COUNT(*) FROM pg_inherits WHERE inhparent = pg_class.oid) "
+            "FROM pg_class WHERE oid = %s::regclass",
+            [Rate._meta.db_table],
+        )
+        is_partitioned, partitions = cursor.fetchone()
+    return partitions if is_partitioned else None
 
-    if total_rates == 0:
-        return 0.0
 
-    if suspected_rates_count < total_rates * suspected_rates_threshold:
-        """consider as normal rates"""
-        return Rate.objects.filter(post_id=post.id).aggregate(
-            average=Coalesce(Round(Avg('score'), precision=1), 0.0)
-        )['average']
-    else:
-        """Remove suspected rates from the average calculation"""
-        return Rate.objects.filter(post_id=post.id, is_suspected=False).aggregate(
-            average=Coalesce(Round(Avg('score'), precision=1), 0.0)
-        )['average']
+def get_rates_updated_since(*, rate_data: list[dict], since: datetime) -> set[tuple[int, int]]:
+    """The (post, user) pairs among `rate_data` whose rate was written after `since`"""
+    pairs = {(rate['post_id'], rate['user_id']) for rate in rate_data}
+    updated = Rate.objects.filter(
+        post_id__in={post_id for post_id, _ in pairs},
+        user_id__in={user_id for _, user_id in pairs},
+        updated_at__gt=since,
+    ).values_list('post_id', 'user_id')
+    return pairs.intersection(updated)
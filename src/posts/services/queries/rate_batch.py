@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from posts.models import AppliedRateBatch, AppliedRateStreamEntry
+
+
+def is_rate_batch_applied(*, batch_id: str) -> bool:
+    return AppliedRateBatch.objects.filter(batch_id=batch_id).exists()
+
+
+def get_applied_stream_entry_ids(*, entry_ids: list[str]) -> set[str]:
+    """The rate stream entries among `entry_ids` some batch of the ledger already applied"""
+    return set(AppliedRateStreamEntry.objects.filter(entry_id__in=entry_ids).values_list('entry_id', flat=True))
+
+
+def get_pending_stats_rate_batch_ids(*, older_than: float) -> list[str]:
+    """Batches written at least `older_than` seconds ago whose stats deltas were never applied"""
+    return list(
+        AppliedRateBatch.objects.filter(
+            stats_applied_at__isnull=True, created_at__lt=timezone.now() - timedelta(seconds=older_than)
+        ).order_by('created_at').values_list('batch_id', flat=True)
+    )
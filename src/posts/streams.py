@@ -0,0 +1,101 @@
+import json
+import os
+import socket
+
+import redis
+from django.conf import settings
+
+from core.settings.third_parties.redis_templates import RedisKeyTemplates
+from posts.buffers import async_redis_client, redis_client
+
+
+class RateStream:
+    """
+    Redis Stream of submitted rates consumed by a consumer group.
+    Entries stay in the pending entries list (PEL) of the consumer that read them until they are acked,
+    which gives at-least-once delivery and lets another consumer reclaim them after a crash.
+    """
+    key = RedisKeyTemplates.rate_stream_key()
+    group = settings.RATE_STREAM_GROUP
+
+    @staticmethod
+    def consumer_name(prefix: str = 'consumer') -> str:
+        return f"{prefix}-{socket.gethostname()}-{os.getpid()}"
+
+    @staticmethod
+    def _loads(entries) -> list[tuple[str, dict]]:
+        return [
+            (entry_id.decode(), json.loads(fields[b'rate']))
+            for entry_id, fields in entries
+            if fields
+        ]
+
+    @classmethod
+    def add(cls, rate: dict) -> str:
+        return redis_client.xadd(cls.key, {'rate': json.dumps(rate, separators=(',', ':'))}).decode()
+
+    @classmethod
+    async def aadd(cls, rate: dict) -> str:
+        return (await async_redis_client.xadd(cls.key, {'rate': json.dumps(rate, separators=(',', ':'))})).decode()
+
+    @classmethod
+    def add_many(cls, rates: list[dict]) -> list[str]:
+        with redis_client.pipeline(transaction=False) as pipe:
+            for rate in rates:
+                pipe.xadd(cls.key, {'rate': json.dumps(rate, separators=(',', ':'))})
+            return [entry_id.decode() for entry_id in pipe.execute()]
+
+    @classmethod
+    def ensure_group(cls):
+        try:
+            redis_client.xgroup_create(cls.key, cls.group, id='0', mkstream=True)
+        except redis.ResponseError as error:
+            if 'BUSYGROUP' not in str(error):
+                raise
+
+    @classmethod
+    def read_batch(cls, *, consumer: str, count: int, block_ms: int = None) -> list[tuple[str, dict]]:
+        """Read up to `count` entries never delivered to any consumer of the group."""
+        response = redis_client.xreadgroup(cls.group, consumer, {cls.key: '>'}, count=count, block=block_ms)
+        return cls._loads(response[0][1]) if response else []
+
+    @classmethod
+    def ack(cls, entry_ids: list[str]):
+        """Ack and delete applied entries, so the stream only holds the backlog."""
+        with redis_client.pipeline(transaction=True) as pipe:
+            pipe.xack(cls.key, cls.group, *entry_ids)
+            pipe.xdel(cls.key, *entry_ids)
+            pipe.execute()
+
+    @classmethod
+    def reclaim(cls, *, consumer: str, min_idle_ms: int, count: int):
+        """
+        Yield the entries pending for longer than `min_idle_ms`, claimed by `consumer`, `count` at a time: the batches
+        of crashed consumers and the failed batches of live ones, this one included. They need not match the batches
+        they were read in, the ledger skips entries applied already one by one.
+        A claimed entry is idle again only after `min_idle_ms`, so a batch failing again is retried on a later reclaim.
+        """
+        while pending := redis_client.xpending_range(
+            cls.key, cls.group, min='-', max='+', count=count, idle=min_idle_ms
+        ):
+            entry_ids = [entry['message_id'] for entry in pending]
+            if not (entries := redis_client.xclaim(cls.key, cls.group, consumer, min_idle_ms, entry_ids)):
+                """claimed by another consumer in the meantime, leave the rest to it"""
+                break
+
+            if deleted_ids := [entry_id for entry_id, fields in entries if not fields]:
+                """entries deleted from the stream while pending, nothing left to apply"""
+                redis_client.xack(cls.key, cls.group, *deleted_ids)
+
+            if claimed := cls._loads(entries):
+                yield claimed
+
+        for info in redis_client.xinfo_consumers(cls.key, cls.group):
+            name = info['name'].decode() if isinstance(info['name'], bytes) else info['name']
+            if name != consumer and info['idle'] >= min_idle_ms and not info['pending']:
+                """deleting a consumer drops its PEL, so only forget idle consumers with nothing left pending"""
+                redis_client.xgroup_delconsumer(cls.key, cls.group, name)
+
+    @classmethod
+    def size(cls) -> int:
+        return redis_client.xlen(cls.key)
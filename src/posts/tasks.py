@@ -1,14 +1,19 @@
 import logging
+import time
+from math import ceil
 
-from celery import shared_task
+from celery import chord, shared_task
 from django.conf import settings
 from django.core.cache import cache
+from django.db import DatabaseError
 
 from commons.messages.log_messges import LogMessages
 from core.settings.third_parties.redis_templates import RedisKeyTemplates
-from posts.models import Post, PostStat, Rate
-from posts.services.commands.post_stat import update_cache_post_stats, update_post_stat
-from posts.services.queries.rate import calculate_average_rates, get_updated_rates
+from posts.services.commands.post_list import bump_post_stats_version
+from posts.services.commands.post_stat import get_post_id_shards, recompute_post_stats_range, update_cache_post_stats
+from posts.services.commands.rate_batch import apply_rate_batch_stats, prune_rate_batches
+from posts.services.queries.post_stat import acquire_post_stats_shard_lock, release_post_stats_shard_lock
+from posts.services.queries.rate_batch import get_pending_stats_rate_batch_ids
 
 logger = logging.getLogger(__name__)
 
@@ -18,60 +23,120 @@ def apply_pending_rates():
     """
     Apply pending rates to the Rate asynchronously.
     """
-    key = RedisKeyTemplates.pending_rates_key()
-    if pending_rates := cache.get(key, []):
-        from posts.services.commands.rate import bulk_update_or_create_rates
-        bulk_update_or_create_rates(rate_data=pending_rates)
-        cache.delete(key)
+    from posts.buffers import PendingRateBuffer
+    from posts.services.commands.rate import flush_pending_rates
+
+    """drain at most what is buffered right now, so fast producers can not keep the task running forever"""
+    for _ in range(ceil(PendingRateBuffer.size() / settings.PENDING_RATES_BATCH_SIZE)):
+        if not flush_pending_rates(settings.PENDING_RATES_BATCH_SIZE):
+            break
+    logger.info(LogMessages.apply_pending_rates(**PendingRateBuffer.stats()))
 
 
 @shared_task
-def bulk_update_or_create_post_stats(*, scores: dict):
-    post_id_list = scores.keys()
-    post_stats = PostStat.objects.filter(post_id__in=post_id_list)
-
-    """update existing post stats"""
-    for post_stat in post_stats:
-        new_score = scores[post_stat.post_id]["score"]
-        total_score = post_stat.average_rates * post_stat.total_rates
-        post_stat.average_rates = (total_score + new_score) / post_stat.total_rates
-    if post_stats:
-        PostStat.objects.bulk_update(post_stats, ['average_rates', 'total_rates'])
-
-    """create new post stats"""
-    missing_post_ids = set(post_id_list).difference(post_stats.values_list('post_id', flat=True))
-    new_post_stats = [
-        PostStat(
-            post_id=post_id,
-            average_rates=(scores[post_id]["score"] / scores[post_id]["count"]) if scores[post_id]["count"] != 0 else 0,
-            total_rates=scores[post_id]["count"]
-        ) for post_id in set(missing_post_ids)
-    ]
-    created_obj = PostStat.objects.bulk_create(new_post_stats, ignore_conflicts=True)
-
-    """update cache"""
-    update_cache_post_stats(post_stats=[*post_stats, *created_obj])
+def consume_rate_stream_backlog():
+    """
+    Backstop for the `consume_rates` command: apply the rate stream backlog as one more consumer of the group.
+    """
+    from posts.services.commands.rate import consume_rate_stream, reclaim_rate_stream
+    from posts.streams import RateStream
+
+    consumer, batch_size = RateStream.consumer_name(prefix='celery'), settings.PENDING_RATES_BATCH_SIZE
+    RateStream.ensure_group()
+    reclaim_rate_stream(consumer=consumer, batch_size=batch_size)
+    for _ in range(ceil(RateStream.size() / batch_size)):
+        if not consume_rate_stream(consumer=consumer, batch_size=batch_size):
+            break
+
+
+@shared_task(
+    acks_late=True,
+    autoretry_for=(DatabaseError,),
+    retry_backoff=True,
+    max_retries=settings.RATE_BATCH_STATS_MAX_RETRIES,
+)
+def bulk_update_or_create_post_stats(*, batch_id: str):
+    """
+    Apply the score deltas of a rate batch, kept in its ledger row, to the post stats and refresh their cache,
+    which also replaces the negative cache entries of the posts rated for the first time.
+    The ledger marks the deltas applied in the same transaction, so retries and redeliveries of the task are no-ops.
+    """
+    if (post_stats := apply_rate_batch_stats(batch_id=batch_id)) is None:
+        logger.info(LogMessages.skip_rate_batch_stats(batch_id=batch_id))
+        return
+    update_cache_post_stats(post_stats=post_stats)
+    bump_post_stats_version()
 
 
 @shared_task
-def update_post_stats_periodical():
+def resume_rate_batches():
     """
-        Update the average rates and total rates of the post periodically.
-        note: it will consider number of rates that created or updated after updated_at or created_at in post_stat
+    Replay the buffer batches that were popped and never completed (e.g. the worker died before the commit),
+    enqueue again the stats of the rate batches whose task was lost (e.g. the worker died right after the commit),
+    and prune the ledger rows past their retention.
     """
-    try:
-        for post in Post.objects.all():
-            post_stat, created = PostStat.objects.get_or_create(post_id=post.id)
-            last_update = post_stat.updated_at if not created else post.created_at
+    from posts.services.commands.rate import replay_buffered_rate_batches
+
+    replayed = replay_buffered_rate_batches(older_than=settings.RATE_BATCH_STATS_RESUME_AFTER)
+    batch_ids = get_pending_stats_rate_batch_ids(older_than=settings.RATE_BATCH_STATS_RESUME_AFTER)
+    for batch_id in batch_ids:
+        bulk_update_or_create_post_stats.delay(batch_id=batch_id)
+    pruned = prune_rate_batches(older_than=settings.RATE_BATCH_LEDGER_RETENTION)
+    logger.info(LogMessages.resume_rate_batches(replayed=replayed, resumed=len(batch_ids), pruned=pruned))
 
-            updated_rates = get_updated_rates(post, last_update)
 
-            if updated_rates.exists():
-                average_rates = calculate_average_rates(post, settings.SUSPECTED_RATES_THRESHOLD)
-                total_rates = Rate.objects.filter(post_id=post.id).count()
-                update_post_stat(post, average_rates, total_rates)
-            else:
-                logger.info(LogMessages.no_new_rate(post_id=post.id))
+@shared_task
+def update_post_stats_periodical():
+    """
+        Recompute the stats of all posts from their rates, fanned out as one shard task per range of post ids.
+        note: the incremental rate batches keep the stats correct, this only repairs drift (e.g. deleted rates)
+    """
+    try:
+        shards = get_post_id_shards(shard_size=settings.STATS_RECOMPUTE_SHARD_SIZE)
+        chord(
+            recompute_post_stats_shard.s(start_id=start_id, end_id=end_id) for start_id, end_id in shards
+        )(record_post_stats_recompute.s(started_at=time.time()))
 
     except Exception as e:
         logger.error(LogMessages.error_update_post_stats(error=e))
+
+
+@shared_task
+def recompute_post_stats_shard(*, start_id: int, end_id: int):
+    """
+    Recompute one range of post ids, the shard lock makes overlapping runs and duplicate deliveries skip it.
+    """
+    if (lock_token := acquire_post_stats_shard_lock(start_id=start_id, end_id=end_id)) is None:
+        logger.info(LogMessages.skip_post_stats_shard(start_id=start_id, end_id=end_id))
+        return {'start_id': start_id, 'end_id': end_id, 'rows': 0, 'skipped': True}
+
+    try:
+        report = recompute_post_stats_range(start_id=start_id, end_id=end_id)
+        bump_post_stats_version()
+        logger.info(LogMessages.recompute_post_stats(**report))
+        return {'start_id': start_id, 'end_id': end_id, 'rows': report['rows'], 'skipped': False}
+    finally:
+        release_post_stats_shard_lock(start_id=start_id, end_id=end_id, token=lock_token)
+
+
+@shared_task
+def record_post_stats_recompute(shard_reports: list[dict], *, started_at: float):
+    """
+    Chord callback of the periodic recompute: record which ranges were covered and the wall-clock time of the run.
+    """
+    seconds = time.time() - started_at
+    rows = sum(shard_report['rows'] for shard_report in shard_reports)
+    report = {
+        'rows': rows,
+        'shards': len(shard_reports),
+        'skipped': sum(shard_report['skipped'] for shard_report in shard_reports),
+        'seconds': seconds,
+        'rows_per_second': rows / seconds if seconds else 0,
+    }
+    cache.set(
+        RedisKeyTemplates.post_stats_recompute_key(),
+        {**report, 'finished_at': time.time(), 'shard_reports': shard_reports},
+        timeout=None
+    )
+    logger.info(LogMessages.recompute_post_stats_run(**report))
+    return report
@@ -0,0 +1,91 @@
+import base64
+import json
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from posts.models import Post
+
+POST_LIST_URL = reverse('api-v1:posts:post:post-list')
+
+
+def encode_cursor(cursor: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+
+@override_settings(POST_LIST_CACHE_TTL=0, POST_LIST_PAGINATION='page')
+class PostListPaginationTest(APITestCase):
+    """
+    The post list paginated by keyset (?pagination=cursor) and by page number, on posts of which four share
+    their created_at, more than a page, so the pages have to break the tie on id.
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(get_user_model().objects.create(username='reader'))
+        self.posts = Post.objects.bulk_create([Post(title=f'post {i}', content='content') for i in range(7)])
+        Post.objects.filter(id__in=[post.id for post in self.posts[1:5]]).update(created_at=timezone.now())
+
+    def get_cursor_pages(self, **params) -> list[list[int]]:
+        """follow the next links from the first page, returns the post ids of every page"""
+        pages, url, params = [], POST_LIST_URL, {'pagination': 'cursor', 'page_size': 3, **params}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            pages.append([post['id'] for post in response.data['results']])
+            url, params = response.data['next'], None
+        return pages
+
+    def test_cursor_pages_list_every_post_once_in_order(self):
+        pages = self.get_cursor_pages()
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(
+            [post_id for page in pages for post_id in page],
+            list(Post.objects.order_by('-created_at', '-id').values_list('id', flat=True)),
+        )
+
+    def test_cursor_pages_of_the_ascending_ordering(self):
+        pages = self.get_cursor_pages(ordering='created_at')
+        self.assertEqual(
+            [post_id for page in pages for post_id in page],
+            list(Post.objects.order_by('created_at', 'id').values_list('id', flat=True)),
+        )
+
+    def test_cursor_holds_the_exact_position_of_the_last_row(self):
+        response = self.client.get(POST_LIST_URL, {'pagination': 'cursor', 'page_size': 3})
+        encoded, = parse_qs(urlparse(response.data['next']).query)['cursor']
+        cursor = json.loads(base64.urlsafe_b64decode(encoded))
+        last_post = Post.objects.get(id=response.data['results'][-1]['id'])
+
+        self.assertEqual(cursor['ordering'], ['-created_at', '-id'])
+        self.assertEqual(cursor['position'], [last_post.created_at.isoformat(), last_post.id])
+
+    def test_invalid_cursors_are_not_found(self):
+        first = Post.objects.order_by('-created_at', '-id').first()
+        cursors = [
+            'not-a-cursor',
+            encode_cursor({'position': [first.created_at.isoformat(), first.id]}),
+            encode_cursor({'ordering': ['-created_at', '-id'], 'position': [first.id]}),
+            encode_cursor({'ordering': ['created_at', 'id'], 'position': [first.created_at.isoformat(), first.id]}),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(POST_LIST_URL, {'pagination': 'cursor', 'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+    def test_the_page_number_pagination_is_the_default(self):
+        response = self.client.get(POST_LIST_URL, {'page_size': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_the_query_parameter_switches_the_paginator(self):
+        response = self.client.get(POST_LIST_URL, {'pagination': 'cursor', 'page_size': 3})
+        self.assertEqual(set(response.data), {'next', 'results'})
+
+        with override_settings(POST_LIST_PAGINATION='cursor'):
+            self.assertEqual(set(self.client.get(POST_LIST_URL).data), {'next', 'results'})
+            self.assertIn('count', self.client.get(POST_LIST_URL, {'pagination': 'page'}).data)
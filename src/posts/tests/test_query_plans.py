@@ -0,0 +1,110 @@
+import json
+import random
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Post, Rate
+from posts.services.commands.post_stat import recompute_post_stats
+from posts.services.commands.rate import upsert_rates
+
+AGGREGATE_INDEX = 'rate_post_suspected_score_idx'
+UNIQUE_INDEX = 'posts_rate_post_id_user_id_3e9be415_uniq'
+INDEX_SCANS = {'Index Scan', 'Index Only Scan'}
+
+
+class RateQueryPlansTest(TransactionTestCase):
+    """
+    Plans of the queries of the rate table on a vacuumed and analyzed table, as a large table would get them:
+    the stats recompute aggregates are index-only scans of the covering index and the rate batch upsert reaches the
+    existing rows through the unique (post, user) index, no query reads the table sequentially.
+    A transaction test case, VACUUM can not run in the transaction of a TestCase.
+    """
+    posts_count = 2000
+    users_count = 25
+
+    def setUp(self):
+        self.users = get_user_model().objects.bulk_create(
+            [get_user_model()(username=f'user_{i}') for i in range(self.users_count)]
+        )
+        self.posts = Post.objects.bulk_create(
+            [Post(title=f'post {i}', content='content') for i in range(self.posts_count)]
+        )
+        with connection.cursor() as cursor:
+            """every user rates every post, in one statement"""
+            cursor.execute(
+                f"INSERT INTO {Rate._meta.db_table} (post_id, user_id, score, is_suspected, created_at, updated_at) "
+                f"SELECT post_id, user_id, floor(random() * 6), random() < 0.1, now(), now() "
+                f"FROM unnest(%s::bigint[]) post_id CROSS JOIN unnest(%s::bigint[]) user_id",
+                [[post.id for post in self.posts], [user.id for user in self.users]],
+            )
+            cursor.execute(f"VACUUM ANALYZE {Rate._meta.db_table}")
+
+    def get_plans(self, function) -> list[dict]:
+        """EXPLAIN, without running them again, of the statements on the rate table `function` runs"""
+        with CaptureQueriesContext(connection) as context:
+            function()
+        plans = []
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                if query['sql'].lstrip().startswith(('SELECT', 'WITH')) and Rate._meta.db_table in query['sql']:
+                    cursor.execute(f"EXPLAIN (FORMAT JSON) {query['sql']}")
+                    plans.append(cursor.fetchone()[0][0]['Plan'])
+        return plans
+
+    @staticmethod
+    def get_parent_index(index: str | None) -> str | None:
+        """the index of a partition is named after its partition, the one of the partitioned rate table is returned"""
+        if index is None:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT parent.relname FROM pg_inherits JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "WHERE pg_inherits.inhrelid = %s::regclass",
+                [index],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else index
+
+    def get_rate_scans(self, plan: dict) -> list[tuple[str, str | None]]:
+        """(node type, index name) of the scans of the rate table, or of its partitions, in a plan"""
+        scans = []
+        if plan['Node Type'].endswith('Scan') and plan.get('Relation Name', '').startswith(Rate._meta.db_table):
+            scans.append((plan['Node Type'], self.get_parent_index(plan.get('Index Name'))))
+        for child in plan.get('Plans', []):
+            scans.extend(self.get_rate_scans(child))
+        return scans
+
+    def assert_rate_scans(self, plan: dict, node_types: set[str], index: str = None):
+        """every scan of the rate table in the plan is one of `node_types` (of `index` when given)"""
+        scans = self.get_rate_scans(plan)
+        self.assertTrue(scans, json.dumps(plan, indent=2))
+        for scan_type, scan_index in scans:
+            self.assertIn(scan_type, node_types, json.dumps(plan, indent=2))
+            if index:
+                self.assertEqual(scan_index, index, json.dumps(plan, indent=2))
+
+    def test_recompute_post_stats_aggregate_is_an_index_only_scan(self):
+        """the rated posts of the chunk, then the grouped aggregate of their rates"""
+        post_ids = sorted(post.id for post in self.posts)
+        rated_posts_plan, aggregate_plan = self.get_plans(
+            lambda: recompute_post_stats(start_id=post_ids[0], end_id=post_ids[10])
+        )
+        self.assert_rate_scans(rated_posts_plan, {'Index Only Scan'})
+        self.assert_rate_scans(aggregate_plan, {'Index Only Scan'}, AGGREGATE_INDEX)
+
+    def test_upsert_rates_reaches_the_existing_rates_through_the_unique_index(self):
+        """
+        Re-rates and new rates, a batch is a tiny fraction of the rates (about 1 for 5000 here, far less in production)
+        so its rows are looked up one by one rather than by reading the table.
+        """
+        new_user = get_user_model().objects.create(username='new_user')
+        users = [*random.sample(self.users, k=8), new_user, new_user]
+        rates = [
+            {'post_id': post.id, 'user_id': user.id, 'score': random.randint(0, 5), 'is_suspected': False}
+            for post, user in zip(random.sample(self.posts, k=10), users)
+        ]
+        upsert_plan, = self.get_plans(lambda: upsert_rates(rates))
+        self.assert_rate_scans(upsert_plan, INDEX_SCANS, UNIQUE_INDEX)
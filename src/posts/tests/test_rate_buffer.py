@@ -0,0 +1,143 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TransactionTestCase
+
+from posts.buffers import PendingRateBuffer, redis_client
+from posts.models import AppliedRateBatch, Post, Rate
+from posts.services.commands.rate import flush_pending_rates, replay_buffered_rate_batches
+
+
+def rate(*, user_id: int, post_id: int, score: int) -> dict:
+    return {'user_id': user_id, 'post_id': post_id, 'score': score, 'is_suspected': False}
+
+
+def clear_buffer():
+    for batch_id in redis_client.zrange(PendingRateBuffer.processing_key, 0, -1):
+        PendingRateBuffer.complete(batch_id.decode())
+    redis_client.delete(PendingRateBuffer.key, PendingRateBuffer.stats_key)
+
+
+class PendingRateBufferTest(SimpleTestCase):
+    """The Redis side of the buffer: coalescing of the pending pairs, popped batches and the counters."""
+
+    def setUp(self):
+        clear_buffer()
+        self.addCleanup(clear_buffer)
+
+    def test_rerate_of_a_pending_pair_replaces_its_rate(self):
+        PendingRateBuffer.push(rate(user_id=1, post_id=1, score=1))
+        PendingRateBuffer.push_many([rate(user_id=1, post_id=1, score=4), rate(user_id=2, post_id=1, score=2)])
+        self.assertEqual(PendingRateBuffer.push(rate(user_id=1, post_id=1, score=5)), 2)
+
+        rates = PendingRateBuffer.pop_batch(10, batch_id='buffer:coalesced')
+        self.assertCountEqual(rates, [rate(user_id=1, post_id=1, score=5), rate(user_id=2, post_id=1, score=2)])
+
+    def test_batches_never_share_a_pair(self):
+        PendingRateBuffer.push_many([rate(user_id=user_id, post_id=1, score=3) for user_id in range(5)])
+        first = PendingRateBuffer.pop_batch(3, batch_id='buffer:first')
+        second = PendingRateBuffer.pop_batch(3, batch_id='buffer:second')
+
+        self.assertEqual((len(first), len(second)), (3, 2))
+        self.assertCountEqual([item['user_id'] for item in first + second], range(5))
+        self.assertEqual(PendingRateBuffer.pop_batch(3, batch_id='buffer:empty'), [])
+        self.assertEqual(PendingRateBuffer.get_processing_batch_ids(older_than=0), ['buffer:first', 'buffer:second'])
+
+    def test_popped_batch_is_kept_until_completed(self):
+        PendingRateBuffer.push_many([rate(user_id=1, post_id=1, score=3), rate(user_id=2, post_id=1, score=4)])
+        popped = PendingRateBuffer.pop_batch(10, batch_id='buffer:kept')
+
+        rates, popped_at = PendingRateBuffer.get_processing_batch('buffer:kept')
+        self.assertCountEqual(rates, popped)
+        self.assertIsNotNone(popped_at)
+        self.assertEqual(PendingRateBuffer.get_processing_batch_ids(older_than=60), [])
+
+        PendingRateBuffer.complete('buffer:kept')
+        self.assertEqual(PendingRateBuffer.get_processing_batch('buffer:kept'), ([], None))
+        self.assertEqual(PendingRateBuffer.get_processing_batch_ids(older_than=0), [])
+
+    def test_stats_balance_the_pushed_rates(self):
+        PendingRateBuffer.push_many([rate(user_id=user_id, post_id=1, score=2) for user_id in range(4)])
+        PendingRateBuffer.push_many([rate(user_id=user_id, post_id=1, score=5) for user_id in range(2)])
+        PendingRateBuffer.pop_batch(3, batch_id='buffer:stats')
+
+        stats = PendingRateBuffer.stats()
+        self.assertEqual(
+            stats, {
+                'pushed': 6, 'flushed': 3, 'pending': 1, 'coalesced': 2, 'coalescing_ratio': 2 / 6, 'processing': 1
+            }
+        )
+        self.assertEqual(stats['pushed'], stats['flushed'] + stats['pending'] + stats['coalesced'])
+
+
+@mock.patch('posts.services.commands.rate.bulk_update_or_create_post_stats')
+class BufferedRateReplayTest(TransactionTestCase):
+    """
+    Buffer batches applied, failed and replayed against the database. Every statement commits on its own, so a rate
+    written after a batch was popped has a later updated_at, as it has in production.
+    """
+
+    def setUp(self):
+        clear_buffer()
+        self.addCleanup(clear_buffer)
+        self.post = Post.objects.create(title='post', content='content')
+        self.users = get_user_model().objects.bulk_create(
+            [get_user_model()(username=f'rater {i}') for i in range(2)]
+        )
+
+    def rate(self, user: int, score: int) -> dict:
+        return rate(user_id=self.users[user].id, post_id=self.post.id, score=score)
+
+    def scores(self) -> dict[int, int]:
+        user_ids = [user.id for user in self.users]
+        return {user_ids.index(rate.user_id): rate.score for rate in Rate.objects.filter(post=self.post)}
+
+    def fail_flush(self):
+        with mock.patch('posts.services.commands.rate.upsert_rates', side_effect=RuntimeError('database down')):
+            with self.assertRaises(RuntimeError):
+                flush_pending_rates(10)
+
+    def test_applied_batch_is_completed(self, _):
+        PendingRateBuffer.push_many([self.rate(0, 3), self.rate(1, 4)])
+
+        self.assertEqual(flush_pending_rates(10), 2)
+        self.assertEqual(self.scores(), {0: 3, 1: 4})
+        self.assertEqual(PendingRateBuffer.stats()['processing'], 0)
+
+    def test_failed_batch_is_replayed_under_its_batch_id(self, _):
+        PendingRateBuffer.push_many([self.rate(0, 3), self.rate(1, 4)])
+        self.fail_flush()
+        batch_id, = PendingRateBuffer.get_processing_batch_ids(older_than=0)
+        self.assertEqual((self.scores(), AppliedRateBatch.objects.count()), ({}, 0))
+
+        self.assertEqual(replay_buffered_rate_batches(older_than=0), 1)
+        self.assertEqual(self.scores(), {0: 3, 1: 4})
+        self.assertEqual(list(AppliedRateBatch.objects.values_list('batch_id', 'rates')), [(batch_id, 2)])
+        self.assertEqual(PendingRateBuffer.get_processing_batch_ids(older_than=0), [])
+
+    def test_replay_keeps_the_newer_rate_of_a_pair(self, _):
+        PendingRateBuffer.push_many([self.rate(0, 3), self.rate(1, 4)])
+        self.fail_flush()
+        PendingRateBuffer.push(self.rate(0, 5))
+        flush_pending_rates(10)
+
+        replay_buffered_rate_batches(older_than=0)
+        self.assertEqual(self.scores(), {0: 5, 1: 4})
+
+    def test_batch_committed_before_it_was_completed_is_not_applied_again(self, _):
+        PendingRateBuffer.push_many([self.rate(0, 3), self.rate(1, 4)])
+        with mock.patch.object(PendingRateBuffer, 'complete'):
+            flush_pending_rates(10)
+        Rate.objects.filter(post=self.post, user=self.users[0]).update(score=1)
+
+        self.assertEqual(replay_buffered_rate_batches(older_than=0), 1)
+        self.assertEqual(self.scores(), {0: 1, 1: 4})
+        self.assertEqual(AppliedRateBatch.objects.count(), 1)
+        self.assertEqual(PendingRateBuffer.get_processing_batch_ids(older_than=0), [])
+
+    def test_recent_batches_are_left_to_their_worker(self, _):
+        PendingRateBuffer.push(self.rate(0, 3))
+        self.fail_flush()
+
+        self.assertEqual(replay_buffered_rate_batches(older_than=60), 0)
+        self.assertEqual(PendingRateBuffer.stats()['processing'], 1)
@@ -0,0 +1,84 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from posts.models import AppliedRateBatch, AppliedRateStreamEntry, Post, Rate
+from posts.services.commands.rate import _apply_stream_entries, consume_rate_stream, reclaim_rate_stream
+from posts.streams import RateStream, redis_client
+
+
+@override_settings(RATE_STREAM_RECLAIM_IDLE_MS=0)
+@mock.patch('posts.services.commands.rate.bulk_update_or_create_post_stats')
+class RateStreamLedgerTest(TestCase):
+    """
+    Stream entries delivered again, after a failed batch or a crashed consumer, and in batches cut differently:
+    each of them is applied by exactly one batch of the ledger.
+    """
+
+    def setUp(self):
+        redis_client.delete(RateStream.key)
+        RateStream.ensure_group()
+        self.addCleanup(redis_client.delete, RateStream.key)
+        self.post = Post.objects.create(title='post', content='content')
+        self.users = get_user_model().objects.bulk_create(
+            [get_user_model()(username=f'rater {i}') for i in range(3)]
+        )
+        RateStream.add_many(
+            [{'user_id': user.id, 'post_id': self.post.id, 'score': 3, 'is_suspected': False} for user in self.users]
+        )
+
+    @staticmethod
+    def pending() -> int:
+        return redis_client.xpending(RateStream.key, RateStream.group)['pending']
+
+    @staticmethod
+    def wait_idle():
+        """an entry read in the current millisecond is not idle yet, even for a reclaim of entries idle for 0 ms"""
+        time.sleep(0.01)
+
+    @staticmethod
+    def consumers() -> set[str]:
+        return {info['name'].decode() for info in redis_client.xinfo_consumers(RateStream.key, RateStream.group)}
+
+    def test_failed_batch_is_reclaimed_by_its_own_consumer(self, _):
+        with mock.patch('posts.services.commands.rate.upsert_rates', side_effect=RuntimeError('database down')):
+            with self.assertRaises(RuntimeError):
+                consume_rate_stream(consumer='live', batch_size=10)
+        self.assertEqual((self.pending(), Rate.objects.count()), (3, 0))
+
+        self.wait_idle()
+        self.assertEqual(reclaim_rate_stream(consumer='live', batch_size=10), 3)
+        self.assertEqual((self.pending(), Rate.objects.count(), RateStream.size()), (0, 3, 0))
+
+    def test_entries_of_a_dead_consumer_are_reclaimed_and_it_is_forgotten(self, _):
+        RateStream.read_batch(consumer='dead', count=10)
+
+        self.wait_idle()
+        self.assertEqual(reclaim_rate_stream(consumer='live', batch_size=2), 3)
+        self.assertEqual((self.pending(), Rate.objects.count()), (0, 3))
+        self.assertEqual(self.consumers(), {'live'})
+
+    def test_entry_redelivered_in_another_batch_is_applied_once(self, _):
+        entries = RateStream.read_batch(consumer='dead', count=10)
+        """the consumer committed its first two entries and died before acking them"""
+        with mock.patch.object(RateStream, 'ack'):
+            _apply_stream_entries(entries[:2])
+        Rate.objects.filter(user=self.users[0]).update(score=5)
+
+        self.wait_idle()
+        self.assertEqual(reclaim_rate_stream(consumer='live', batch_size=10), 3)
+        self.assertEqual(sorted(AppliedRateBatch.objects.values_list('rates', flat=True)), [1, 2])
+        self.assertEqual(AppliedRateStreamEntry.objects.count(), 3)
+        self.assertEqual(Rate.objects.get(user=self.users[0]).score, 5)
+        self.assertEqual(self.pending(), 0)
+
+    def test_batch_of_applied_entries_is_only_acked(self, _):
+        entries = RateStream.read_batch(consumer='live', count=10)
+        _apply_stream_entries(entries)
+        self.assertEqual(RateStream.size(), 0)
+
+        _apply_stream_entries(entries)
+        self.assertEqual(AppliedRateBatch.objects.count(), 1)
+        self.assertEqual(AppliedRateStreamEntry.objects.count(), 3)
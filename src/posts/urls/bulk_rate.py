@@ -0,0 +1,11 @@
+from rest_framework.routers import SimpleRouter
+
+from posts.viewsets import BulkRateViewSet
+
+app_name = 'bulk-rate'
+
+router = SimpleRouter()
+
+router.register(r'', BulkRateViewSet, basename='bulk-rate')
+
+urlpatterns = router.urls
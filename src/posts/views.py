@@ -0,0 +1,63 @@
+import json
+from math import ceil
+
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, NotFound, ParseError, Throttled
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+
+from commons.fraud_detection import FraudDetection
+from commons.throttles import PostRateThrottle, UserHourlyPostRateThrottle
+from posts.models import Post
+from posts.serialzers.rate import RateScoreSerializer
+from posts.services.commands.rate import aupdate_or_create_rate
+
+
+def error_response(exception, headers: dict = None) -> JsonResponse:
+    """The body DRF's exception handler renders for the exception."""
+    data = exception.detail if isinstance(exception.detail, dict) else {'detail': exception.detail}
+    return JsonResponse(data, status=exception.status_code, headers=headers)
+
+
+@csrf_exempt
+@require_POST
+async def create_rate(request, post_id: int):
+    """
+    Async counterpart of RateViewSet.create for the ASGI app: the same checks and response, but the throttles,
+    the fraud check and the buffer use the async redis client and the post lookup is an async EXISTS query,
+    so a worker serves other requests while this one waits on redis and postgres.
+    The user comes from the JWT claims without a query (JWTStatelessUserAuthentication).
+    """
+    try:
+        if (authenticated := JWTStatelessUserAuthentication().authenticate(request)) is None:
+            return error_response(NotAuthenticated())
+    except AuthenticationFailed as exception:
+        return error_response(exception)
+    request.user = authenticated[0]
+
+    for throttle in (PostRateThrottle(), UserHourlyPostRateThrottle()):
+        if not await throttle.aallow_request(request, None):
+            wait = throttle.wait()
+            return error_response(Throttled(wait), headers={'Retry-After': str(ceil(wait))})
+
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return error_response(ParseError())
+    serializer = RateScoreSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    if not await Post.objects.filter(id=post_id).aexists():
+        return error_response(NotFound('No Post matches the given query.'))
+
+    score = serializer.validated_data['score']
+    await aupdate_or_create_rate(
+        user_id=request.user.id,
+        post_id=post_id,
+        score=score,
+        is_suspected=await FraudDetection.adetect_suspicious_activity(post_id=post_id),
+    )
+    return JsonResponse({'score': score}, status=status.HTTP_201_CREATED)
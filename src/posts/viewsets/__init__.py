@@ -1,4 +1,4 @@
-__all__ = ("PostViewSet", "RateViewSet")
+__all__ = ("PostViewSet", "RateViewSet", "BulkRateViewSet")
 
 from posts.viewsets.post import PostViewSet
-from posts.viewsets.rate import RateViewSet
+from posts.viewsets.rate import BulkRateViewSet, RateViewSet
@@ -1,13 +1,115 @@
-from commons.pagination import StandardResultsSetPagination
+from django.conf import settings
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+
+from commons.pagination import KeysetPagination, StandardResultsSetPagination
 from commons.viewsets import ListModelViewSet
+from posts.enums import PostListPaginationEnum, PostStatsSourceEnum
 from posts.models import Post
-from posts.serialzers.post import PostSerializer
+from posts.leaderboards import PostLeaderboard
+from posts.serialzers.post import (
+    PostDistributionSerializer, PostListFilterSerializer, PostSerializer, TopPostSerializer, TopPostsQuerySerializer
+)
+from posts.services.queries.post_list import (
+    get_cached_post_list_page, get_post_list_etag, get_post_list_page_key, get_post_stats_version,
+    set_cached_post_list_page
+)
+from posts.services.queries.post_stat import get_post_distribution
 
 
 class PostViewSet(ListModelViewSet):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     pagination_class = StandardResultsSetPagination
+    lookup_value_regex = r'\d+'
+    """
+    ?ordering= -> order_by of the list, each ends with a unique field so it can be paginated by keyset.
+    The rating orderings and filters list the rated posts only, straight from the PostStat rows: a rating ordering
+    is a scan, forward or backward, of the PostStat index on (column, post_id) that stops after one page, and a
+    range filter alone is a range scan of the index of its column.
+    """
+    orderings = {
+        '-created_at': ('-created_at', '-id'),
+        'created_at': ('created_at', 'id'),
+        '-average_rates': ('-stat__average_rates', '-stat__post_id'),
+        'average_rates': ('stat__average_rates', 'stat__post_id'),
+        '-total_rates': ('-stat__total_rates', '-stat__post_id'),
+        'total_rates': ('stat__total_rates', 'stat__post_id'),
+    }
+    default_ordering = '-created_at'
 
     def get_queryset(self):
-        return self.queryset.prefetch_related('stat')
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            return queryset
+
+        ordering = self.request.query_params.get('ordering', self.default_ordering)
+        ordering = ordering if ordering in self.orderings else self.default_ordering
+        filters = PostListFilterSerializer(data=self.request.query_params)
+        filters.is_valid(raise_exception=True)
+        if filters.validated_data or ordering.lstrip('-') in ('average_rates', 'total_rates'):
+            queryset = queryset.filter(stat__isnull=False, **filters.get_filters())
+        if settings.POST_STATS_SOURCE == PostStatsSourceEnum.JOIN:
+            queryset = queryset.select_related('stat')
+        return queryset.order_by(*self.orderings[ordering])
+
+    @property
+    def paginator(self):
+        """?pagination=cursor (or POST_LIST_PAGINATION) switches the list to keyset pagination"""
+        if not hasattr(self, '_paginator'):
+            pagination = self.request.query_params.get('pagination', settings.POST_LIST_PAGINATION)
+            self._paginator = (
+                KeysetPagination if pagination == PostListPaginationEnum.CURSOR else self.pagination_class
+            )()
+        return self._paginator
+
+    def list(self, request, *args, **kwargs):
+        """
+        Pages are cached per url and global stats version, bumping the version invalidates all of them.
+        ETag and Last-Modified let clients revalidate a page with a 304 that skips the page cache too.
+        """
+        version, modified_at = get_post_stats_version()
+        page_key = get_post_list_page_key(version=version, url=request.build_absolute_uri())
+        etag = quote_etag(get_post_list_etag(page_key))
+
+        if (response := get_conditional_response(request, etag=etag, last_modified=modified_at)) is None:
+            if (data := get_cached_post_list_page(page_key)) is None:
+                response = super().list(request, *args, **kwargs)
+                set_cached_post_list_page(page_key, response.data)
+            else:
+                response = Response(data)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modified_at)
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['include_distribution'] = 'distribution' in self.request.query_params.getlist('include')
+        context['post_stats_source'] = settings.POST_STATS_SOURCE
+        return context
+
+    @action(detail=True, methods=['get'], url_path='stats', serializer_class=PostDistributionSerializer)
+    def stats(self, request, pk=None):
+        distribution = get_post_distribution(post_id=int(pk))
+        if not distribution['total_rates'] and not Post.objects.filter(id=pk).exists():
+            raise Http404
+        return Response(self.get_serializer(distribution).data)
+
+    @action(
+        detail=False, methods=['get'], url_path='top', serializer_class=TopPostSerializer,
+        authentication_classes=[JWTStatelessUserAuthentication],
+    )
+    def top(self, request):
+        """
+        Best rated posts from the leaderboard: one sorted set range read, and no database query since the user is
+        authenticated from the token claims alone.
+        """
+        query = TopPostsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        return Response(self.get_serializer(PostLeaderboard.top(query.validated_data['limit']), many=True).data)
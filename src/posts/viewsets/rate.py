@@ -1,10 +1,12 @@
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 
-from commons.throttles import PostRateThrottle, UserHourlyPostRateThrottle
+from commons.throttles import (
+    BulkPostRateThrottle, BulkUserHourlyPostRateThrottle, PostRateThrottle, UserHourlyPostRateThrottle
+)
 from commons.viewsets import CreateModelViewSet
 from posts.models import Post, Rate
-from posts.serialzers.rate import RateSerializer
+from posts.serialzers.rate import BulkRateSerializer, RateSerializer
 
 
 class RateViewSet(CreateModelViewSet):
@@ -17,3 +19,10 @@ class RateViewSet(CreateModelViewSet):
         post_id = self.kwargs.get('post_id')
         post = get_object_or_404(Post, id=post_id)
         serializer.save(post=post)
+
+
+class BulkRateViewSet(CreateModelViewSet):
+    """Many rates in one request, every rate counts against the throttles."""
+    serializer_class = BulkRateSerializer
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [BulkPostRateThrottle, BulkUserHourlyPostRateThrottle]
@@ -1,8 +1,12 @@
 from django.urls import include, path
 
+from posts.views import create_rate
+
 app_name = 'posts'
 
 urlpatterns = [
     path('', include('posts.urls.post', namespace='post'), name='posts'),
     path('<int:post_id>/rates/', include('posts.urls.rate', namespace='rate'), name='rates'),
+    path('<int:post_id>/rates/async/', create_rate, name='async-rates'),
+    path('rates/bulk/', include('posts.urls.bulk_rate', namespace='bulk-rate'), name='bulk-rates'),
 ]